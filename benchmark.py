@@ -0,0 +1,283 @@
+# Offline benchmark of the report pipeline.
+# The YouTube, Reddit and Gemini clients are replaced by local stand-ins that
+# serve synthetic but deterministic playlist pages, video statistics, subreddit
+# listings and topic responses, so runs need no credentials and are comparable
+# between commits. Every channel count is run once for wall-clock and per-stage
+# time, then once more under tracemalloc for peak memory. tracemalloc only sees
+# memory Python allocates, not the image buffers inside Pillow.
+#
+#   python benchmark.py
+#   python benchmark.py --channels 19 200 --latency 0.05 --workers 16
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from urllib.parse import urlencode
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+import pytz
+
+from cards import CardRenderer, add_card_arguments
+from images import ImageWriter, add_image_arguments
+from llm import TopicService
+from metrics import Metrics
+from reddit_api import RedditClient
+from snapshots import SnapshotStore
+from youtube_api import MAX_IDS_PER_REQUEST, PLAYLIST_PREFIXES, YouTubeClient
+import reddit as reddit_report
+import youtube_trends
+
+CHANNEL_COUNTS = [19, 200, 2000]
+FONTS = ['Helvetica.ttf', 'Helvetica-Bold.ttf']
+
+# Every synthetic channel uploads every UPLOAD_INTERVAL hours and every
+# SHORT_EVERY-th upload is a Short, so a 30-day window holds 24 uploads
+UPLOAD_INTERVAL = 30
+SHORT_EVERY = 3
+UPLOADS_PER_CHANNEL = 100
+
+
+def checksum(value):
+    return zlib.crc32(value.encode('utf-8'))
+
+
+def synthetic_channels(count):
+    return [
+        {"name": f"Channel {i}", "id": f"UCbenchmark{i:011d}"}
+        for i in range(count)
+    ]
+
+
+class FakeRequest:
+    # Stands in for a googleapiclient HttpRequest: YouTubeClient only needs its
+    # uri (to key the cache) and execute()
+    def __init__(self, api, endpoint, params):
+        self.api = api
+        self.endpoint = endpoint
+        self.params = params
+        self.uri = f"https://youtube.googleapis.com/youtube/v3/{endpoint}?{urlencode(sorted(params.items()))}"
+
+    def execute(self, http=None):
+        if self.api.latency:
+            time.sleep(self.api.latency)
+        if self.endpoint == 'playlistItems':
+            return self.api.playlist_page(self.params)
+        return self.api.video_details(self.params)
+
+
+class FakeCollection:
+    def __init__(self, api, endpoint):
+        self.api = api
+        self.endpoint = endpoint
+
+    def list(self, **params):
+        return FakeRequest(self.api, self.endpoint, params)
+
+    def list_next(self, request, response):
+        if 'nextPageToken' not in response:
+            return None
+        return FakeRequest(self.api, self.endpoint, dict(request.params, pageToken=response['nextPageToken']))
+
+
+class FakeYouTube:
+    # The playlistItems and videos endpoints of the Data API. Upload n of a
+    # channel was published n * UPLOAD_INTERVAL hours before the benchmark started.
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.now = datetime.now(pytz.UTC)
+
+    def playlistItems(self):
+        return FakeCollection(self, 'playlistItems')
+
+    def videos(self):
+        return FakeCollection(self, 'videos')
+
+    def playlist_page(self, params):
+        prefix = next(
+            prefix for prefix in sorted(PLAYLIST_PREFIXES.values(), key=len, reverse=True)
+            if params['playlistId'].startswith(prefix)
+        )
+        channel = params['playlistId'][len(prefix):]
+        uploads = [
+            n for n in range(UPLOADS_PER_CHANNEL)
+            if prefix == PLAYLIST_PREFIXES['uploads']
+            or (n % SHORT_EVERY == 0) == (prefix == PLAYLIST_PREFIXES['shorts'])
+        ]
+
+        start = int(params.get('pageToken', 0))
+        end = start + params.get('maxResults', 5)
+        response = {'items': [self.playlist_item(channel, n) for n in uploads[start:end]]}
+        if end < len(uploads):
+            response['nextPageToken'] = str(end)
+        return response
+
+    def playlist_item(self, channel, n):
+        video_id = f"{channel[-8:]}{n:03d}"
+        published = self.now - timedelta(hours=n * UPLOAD_INTERVAL)
+        return {
+            'snippet': {
+                'publishedAt': published.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'title': f"Upload {n} of {channel}: how to budget, save and invest your money",
+                'resourceId': {'videoId': video_id},
+            }
+        }
+
+    def video_details(self, params):
+        video_ids = params['id'].split(',')
+        assert len(video_ids) <= MAX_IDS_PER_REQUEST
+        return {'items': [
+            {
+                'id': video_id,
+                'statistics': {'viewCount': str(checksum(video_id) % 1000000), 'likeCount': str(checksum(video_id) % 10000)},
+                'contentDetails': {'duration': 'PT45S' if int(video_id[-3:]) % SHORT_EVERY == 0 else 'PT12M3S'},
+            }
+            for video_id in video_ids
+        ]}
+
+
+class FakeReddit:
+    # Just enough of praw.Reddit for RedditClient.fetch_top
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.auth = SimpleNamespace(limits={'remaining': None})
+
+    def subreddit(self, name):
+        return SimpleNamespace(top=lambda time_filter, limit: self.top(name, limit))
+
+    def top(self, name, limit):
+        if self.latency:
+            time.sleep(self.latency)
+        return [
+            SimpleNamespace(
+                id=f"{checksum(name):x}{i}",
+                subreddit=SimpleNamespace(display_name=name),
+                title=f"r/{name} post {i}: what I learned paying off my debt",
+                url=f"https://www.reddit.com/r/{name}/comments/{i}",
+                selftext="I finally made a budget and stuck to it. " * (i + 1),
+                score=checksum(f"{name}{i}") % 50000,
+            )
+            for i in range(limit)
+        ]
+
+
+class FakeGemini:
+    # Stands in for genai.Client's async API; answers every prompt with the same topics
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self.generate_content))
+
+    async def generate_content(self, model, contents, config):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        schema = config.response_schema
+        return SimpleNamespace(parsed=schema(**{name: f"Topic {name}" for name in schema.model_fields}))
+
+
+def run_once(count, args):
+    # Run both reports against the stand-ins in a scratch directory and return
+    # the run's metrics
+    metrics = Metrics()
+    topic_service = TopicService(FakeGemini(args.llm_latency), metrics=metrics)
+    youtube = YouTubeClient(FakeYouTube(args.latency), metrics=metrics)
+    reddit = RedditClient(lambda: FakeReddit(args.latency), metrics=metrics)
+    images = ImageWriter(args.image_formats, args.image_effort, metrics)
+    cards = CardRenderer.from_args(args, metrics)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        for font in FONTS:
+            shutil.copy(font, scratch)
+        cwd = os.getcwd()
+        os.chdir(scratch)
+        try:
+            store = None if args.no_snapshots else SnapshotStore(os.path.join(scratch, 'snapshots.sqlite3'))
+            with metrics.stage('youtube', 'total'):
+                youtube_trends.run(youtube, topic_service, workers=args.workers, store=store,
+                                   channels=synthetic_channels(count), images=images, cards=cards)
+            with metrics.stage('reddit', 'total'):
+                reddit_report.run(reddit, topic_service, args.workers, store=store, images=images, cards=cards)
+        finally:
+            if cards is not None:
+                cards.close()
+            os.chdir(cwd)
+
+    return metrics.to_dict()
+
+
+def benchmark(count, args):
+    start = time.perf_counter()
+    run = run_once(count, args)
+    result = {
+        'channels': count,
+        'seconds': round(time.perf_counter() - start, 6),
+        'quota_units': run['quota_units'],
+        'requests': {name: endpoint['requests'] for name, endpoint in run['endpoints'].items()},
+        'stages': run['stages'],
+        'outputs': run['outputs'],
+    }
+
+    if not args.no_memory:
+        tracemalloc.start()
+        try:
+            run_once(count, args)
+            result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return result
+
+
+def print_result(result):
+    peak = result.get('peak_memory_bytes')
+    print(f"{result['channels']:>5} channels  {result['seconds']:>8.2f}s  "
+          f"{result['quota_units']:>6} quota units"
+          + (f"  {peak / 1024 / 1024:>8.1f} MB peak" if peak is not None else ""))
+    for report, stages in result['stages'].items():
+        print(f"      {report:<8} " + "  ".join(
+            f"{name} {stage['seconds']:.2f}s" for name, stage in stages.items()
+        ))
+    formats = {}
+    for output in result['outputs'].values():
+        count, size, seconds = formats.get(output['format'], (0, 0, 0))
+        formats[output['format']] = (count + 1, size + output['bytes'], seconds + output['seconds'])
+    for image_format, (count, size, seconds) in formats.items():
+        print(f"      {image_format:<8} {count} files  {size / 1024:>9.1f} KB  encoded in {seconds:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the reports against local API stand-ins")
+    parser.add_argument('--channels', nargs='+', type=int, default=CHANNEL_COUNTS,
+                        help="Channel counts to benchmark (default: 19 200 2000)")
+    parser.add_argument('--workers', type=int, default=8,
+                        help="Number of channels and subreddits to fetch at the same time (default: 8)")
+    parser.add_argument('--latency', type=float, default=0,
+                        help="Simulated seconds per YouTube or Reddit request (default: 0)")
+    parser.add_argument('--llm-latency', type=float, default=0,
+                        help="Simulated seconds per Gemini request (default: 0)")
+    parser.add_argument('--no-snapshots', action='store_true',
+                        help="Don't record the runs in a snapshot history")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="Skip the peak memory measurement")
+    parser.add_argument('--output', help="Also write the results to this JSON file")
+    add_image_arguments(parser)
+    add_card_arguments(parser)
+    args = parser.parse_args()
+
+    results = []
+    for count in args.channels:
+        result = benchmark(count, args)
+        print_result(result)
+        results.append(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+# SQLite-backed cache of API responses, shared by the collection scripts
+import atexit
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = 'cache.sqlite3'
+
+# How long a cached response stays fresh, in seconds, per endpoint
+DEFAULT_TTLS = {
+    'playlistItems': 6 * 60 * 60,
+    'videos': 60 * 60,
+    'reddit.top': 60 * 60,
+    # LLM results are keyed on their full input, so they only go stale if the
+    # model behind the (experimental) model name changes; they're asked again monthly
+    'gemini.generate_content': 30 * 24 * 60 * 60,
+}
+DEFAULT_TTL = 60 * 60
+
+MAX_BYTES = 200 * 1024 * 1024
+
+# Eviction makes room down to this share of max_bytes, so it doesn't run again
+# on the very next insert
+EVICT_TO = 0.9
+
+# Hits are written back in batches of this many
+ACCESS_BATCH = 500
+
+
+class CacheMiss(Exception):
+    pass
+
+
+def add_cache_arguments(parser):
+    parser.add_argument('--offline', action='store_true',
+                        help="Replay responses from the cache only; never call the APIs")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Neither read nor write the response cache")
+    parser.add_argument('--cache-path', default=CACHE_PATH,
+                        help=f"Response cache file (default: {CACHE_PATH})")
+    parser.add_argument('--render-only', action='store_true',
+                        help="Rebuild the reports from the last run's exports and cached responses "
+                             "without loading the API clients (implies --offline)")
+
+
+class ResponseCache:
+    # Responses are stored as JSON, keyed on a hash of the endpoint and its
+    # parameters. An entry is served while younger than its endpoint's TTL (in
+    # offline mode, at any age); once the file holds more than max_bytes, the
+    # least recently used entries are evicted. The total size is kept as a
+    # running count, so an insert doesn't scan the table, and the access times
+    # of hits are held in memory and written in batches (before an eviction and
+    # when the process exits), so a hit doesn't commit.
+    def __init__(self, path=CACHE_PATH, ttls=None, max_bytes=MAX_BYTES, offline=False):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        # Losing the last inserts on a power cut only costs refetching them
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.db.commit()
+        self.total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.accessed = {}
+        atexit.register(self.flush)
+
+    @classmethod
+    def from_args(cls, args):
+        offline = args.offline or args.render_only
+        if args.no_cache and not offline:
+            return None
+        return cls(args.cache_path, offline=offline)
+
+    @staticmethod
+    def key(endpoint, params):
+        payload = json.dumps([endpoint, params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, endpoint, params):
+        key = self.key(endpoint, params)
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created = row
+            if not self.offline and time.time() - created > self.ttls.get(endpoint, DEFAULT_TTL):
+                return None
+
+            self.accessed[key] = time.time()
+            if len(self.accessed) >= ACCESS_BATCH:
+                self.write_accessed()
+                self.db.commit()
+        return json.loads(value)
+
+    def set(self, endpoint, params, value):
+        value = json.dumps(value)
+        key = self.key(endpoint, params)
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, value, len(value), now, now)
+            )
+            self.accessed.pop(key, None)
+            self.total += len(value) - (row[0] if row else 0)
+            if self.total > self.max_bytes:
+                self.evict()
+            self.db.commit()
+
+    def write_accessed(self):
+        self.db.executemany(
+            "UPDATE responses SET accessed = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in self.accessed.items()]
+        )
+        self.accessed = {}
+
+    def flush(self):
+        # Write the access times of the hits so far
+        with self.lock:
+            if self.accessed:
+                self.write_accessed()
+                self.db.commit()
+
+    def evict(self):
+        # Drop least recently used entries until the cache is back under
+        # EVICT_TO of max_bytes
+        self.write_accessed()
+        target = self.max_bytes * EVICT_TO
+        evicted = []
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            evicted.append((key,))
+            self.total -= size
+            if self.total <= target:
+                break
+        self.db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def fetch(self, endpoint, params, fetch):
+        # Return the cached response, or call fetch() and cache its result
+        return self.fetch_entry(endpoint, params, fetch)[0]
+
+    def fetch_entry(self, endpoint, params, fetch):
+        # Like fetch(), but returns (response, cached), `cached` telling whether
+        # the response was served from the cache rather than the API
+        value = self.get(endpoint, params)
+        if value is not None:
+            return value, True
+        if self.offline:
+            raise CacheMiss(f"No cached response for {endpoint} {params}")
+
+        value = fetch()
+        self.set(endpoint, params, value)
+        return value, False
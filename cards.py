@@ -0,0 +1,139 @@
+# Report cards per channel and per subreddit, each with its own top items and
+# the words that come up most in its titles as its topics (no LLM request per
+# card). Drawing and encoding a card is CPU-bound PIL work, so the cards are
+# rendered in a process pool, one card per task, with the fonts loaded once
+# per worker process.
+#
+#   python youtube_trends.py --cards --card-workers 8
+#   python reddit.py --cards --image-formats png webp
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import multiprocessing
+import os
+import re
+import signal
+import threading
+
+from clustering import tokenize
+from images import EFFORT, ImageWriter
+from layout import body_font, caption_font, header_font, plan_report, title_font
+from metrics import Metrics
+from topk import TopK
+
+CARDS_DIR = 'cards'
+CARD_ITEMS = 5
+CARD_TOPICS = 7
+
+
+def add_card_arguments(parser):
+    parser.add_argument('--cards', action='store_true',
+                        help="Also render a card for every channel or subreddit")
+    parser.add_argument('--cards-dir', default=CARDS_DIR,
+                        help=f"Where to write the cards (default: {CARDS_DIR})")
+    parser.add_argument('--card-workers', type=int, default=os.cpu_count(),
+                        help="Number of processes rendering cards (default: one per CPU)")
+
+
+def slug(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+class CardCollector:
+    # Keeps the top `limit` items and the title word counts of every group
+    # (channel or subreddit) as the items stream past
+    def __init__(self, metric, limit=CARD_ITEMS):
+        self.metric = metric
+        self.limit = limit
+        self.tops = {}
+        self.words = {}
+
+    def add(self, group, item):
+        if group not in self.tops:
+            self.tops[group] = TopK(self.limit, metrics=(self.metric,))
+            self.words[group] = Counter()
+        self.tops[group].add(item)
+        self.words[group].update(set(tokenize(item.title)))
+
+    def groups(self):
+        # (group, top items, topic words) in the order the groups were first seen
+        for group, top in self.tops.items():
+            yield group, top.top(), [word for word, _ in self.words[group].most_common(CARD_TOPICS)]
+
+
+def load_fonts():
+    # layout caches the parsed fonts for the rest of the process
+    for font in (title_font, header_font, body_font, caption_font):
+        font()
+
+
+def init_worker():
+    # Runs once in every worker process. Ctrl-C is left to the parent, which
+    # shuts the pool down.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    load_fonts()
+
+
+def render_card(spec, formats, effort):
+    # Lay out, draw and write one card. Returns its outputs' metrics for the
+    # parent process to record.
+    metrics = Metrics()
+    plan = plan_report(spec['title'], spec['date_range'], spec['topics'], spec['section_title'], spec['entries'])
+    ImageWriter(formats, effort, metrics).save(plan, spec['gradient'], spec['stem'])
+    return metrics.outputs
+
+
+class CardRenderer:
+    # Renders card specs: dicts with the plan_report() arguments ('title',
+    # 'date_range', 'topics', 'section_title', 'entries'), the bar 'gradient'
+    # and the output file 'stem' inside `directory`. The process pool is started
+    # on the first batch and kept, with its fonts loaded, for the next ones
+    # until close(). It is started from the reports' threads while other threads
+    # run, and forking a threaded process can leave a lock held forever in the
+    # child, so its workers come from a forkserver instead (spawned where there
+    # is none, e.g. on Windows).
+    def __init__(self, directory=CARDS_DIR, workers=None, formats=('png',), effort=EFFORT, metrics=None):
+        self.directory = directory
+        self.workers = workers or os.cpu_count()
+        self.formats = formats
+        self.effort = effort
+        self.metrics = metrics or Metrics()
+        self.pool = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_args(cls, args, metrics=None):
+        if not args.cards:
+            return None
+        return cls(args.cards_dir, args.card_workers, args.image_formats, args.image_effort, metrics)
+
+    def render(self, specs):
+        specs = [dict(spec, stem=os.path.join(self.directory, spec['stem'])) for spec in specs]
+        if not specs:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+
+        render = partial(render_card, formats=self.formats, effort=self.effort)
+        if self.workers == 1 or len(specs) == 1:
+            load_fonts()
+            self.record(map(render, specs))
+            return
+
+        with self.lock:
+            if self.pool is None:
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self.pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context(method), initializer=init_worker
+                )
+        self.record(self.pool.map(render, specs))
+
+    def close(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+
+    def record(self, results):
+        for outputs in results:
+            for path, output in outputs.items():
+                self.metrics.output(path, output['format'], output['seconds'], output['bytes'])
@@ -0,0 +1,63 @@
+# Builds the API clients used by the report scripts and the pipeline runner.
+# Keys come from the environment (see load_dotenv() in each entry point).
+# The SDKs are imported and the clients built only when a request actually has
+# to go out, so runs answered from the response cache never load them.
+import os
+import threading
+
+from reddit_api import RedditClient
+from throttle import TokenBucket
+from youtube_api import YouTubeClient
+
+
+class LazyClient:
+    # Calls `build` to create the wrapped client the first time one of its
+    # attributes is used
+    def __init__(self, build):
+        self.build = build
+        self.client = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        if self.client is None:
+            with self.lock:
+                if self.client is None:
+                    self.client = self.build()
+        return self.client
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+
+def youtube_client(args, cache=None, metrics=None):
+    def build_youtube():
+        from googleapiclient.discovery import build
+
+        # The bundled discovery document is already the default without a
+        # discovery URL; the flag only makes that explicit
+        return build('youtube', 'v3', developerKey=os.getenv("YOUTUBE_READ_KEY"), static_discovery=True)
+
+    limiter = TokenBucket(args.requests_per_second, budget=args.quota)
+    return YouTubeClient(LazyClient(build_youtube), limiter, cache, metrics)
+
+
+def reddit_client(cache=None, metrics=None):
+    def build_reddit():
+        import praw
+
+        return praw.Reddit(
+            client_id=os.getenv("REDDIT_CLIENT_ID"),
+            client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
+            user_agent="windows:trends-script:v1.0 (by /u/bitesh9)",
+        )
+
+    return RedditClient(build_reddit, cache=cache, metrics=metrics)
+
+
+def gemini_client():
+    def build_gemini():
+        from google import genai
+
+        return genai.Client(api_key=os.getenv("GEMINI_KEY"))
+
+    return LazyClient(build_gemini)
@@ -0,0 +1,180 @@
+# Groups every collected title (and post body) into topic clusters before topic
+# extraction. Documents are turned into TF-IDF vectors and clustered with
+# spherical k-means, all locally on the CPU with NumPy. Gemini then gets one
+# short summary per cluster (its keywords, size and most representative titles)
+# instead of the top 10 titles, so the topics reflect everything collected while
+# the prompt stays the same size however many posts or videos there are.
+#
+# Clustering is deterministic: the same corpus always gives the same clusters,
+# and so the same prompt and a response cache hit.
+from collections import Counter
+import math
+import re
+
+import numpy as np
+
+CLUSTERS = 8
+MAX_FEATURES = 2000
+KEYWORDS = 6
+REPRESENTATIVES = 3
+ITERATIONS = 20
+
+# Only the start of a long post body is used
+MAX_DOCUMENT_CHARS = 2000
+
+WORD = re.compile(r"[a-z0-9][a-z0-9']*[a-z0-9]")
+STOP_WORDS = frozenset("""
+    about above after again against all also am an and any are aren't as at be because been before being below
+    between both but by can can't could couldn't did didn't do does doesn't doing don't down during each even few
+    for from further get gets getting got had hadn't has hasn't have haven't having he her here hers herself him
+    himself his how i'd i'll i'm i've if in into is isn't it it's its itself just know let's like make me more
+    most much my myself need no nor not now of off on once one only or other our ours ourselves out over own really
+    same she should shouldn't so some still such than that that's the their theirs them themselves then there
+    there's these they they're this those through to too under until up us very want was wasn't we we're were
+    weren't what what's when where which while who whom why will with won't would wouldn't you you'd you'll
+    you're you've your yours yourself yourselves amp com http https www x200b nbsp
+""".split())
+
+
+def add_cluster_arguments(parser):
+    parser.add_argument('--clusters', type=int, default=CLUSTERS,
+                        help="Number of clusters every collected item is grouped into for topic extraction; "
+                             f"0 sends the top 10 titles instead (default: {CLUSTERS})")
+
+
+def tokenize(text):
+    return [
+        word for word in WORD.findall(text.lower())
+        if len(word) > 2 and not word.isdigit() and word not in STOP_WORDS
+    ]
+
+
+class Corpus:
+    # Keeps the text and weight (views, score) of every item as the items stream past
+    def __init__(self):
+        self.titles = []
+        self.texts = []
+        self.weights = []
+
+    def add(self, title, body=None, weight=1):
+        self.titles.append(title)
+        self.texts.append(f"{title}\n{body[:MAX_DOCUMENT_CHARS]}" if body else title)
+        self.weights.append(max(weight, 0))
+
+    def __len__(self):
+        return len(self.titles)
+
+
+def tfidf(texts, max_features=MAX_FEATURES):
+    # Sparse TF-IDF matrix as CSR-style (rows, columns, values) arrays plus the
+    # vocabulary. Rows are L2 normalized, so a dot product is a cosine similarity.
+    counts = [Counter(tokenize(text)) for text in texts]
+    document_frequency = Counter()
+    for terms in counts:
+        document_frequency.update(terms.keys())
+
+    # Terms in a single document can't link documents, and terms in most of
+    # them don't tell them apart
+    n = len(texts)
+    vocabulary = [
+        term for term, frequency in sorted(document_frequency.items(), key=lambda x: (-x[1], x[0]))
+        if 2 <= frequency <= max(2, n // 2)
+    ][:max_features]
+    index = {term: i for i, term in enumerate(vocabulary)}
+    idf = np.array([math.log((1 + n) / (1 + document_frequency[term])) + 1 for term in vocabulary])
+
+    rows, columns, values = [], [], []
+    for row, terms in enumerate(counts):
+        for term, count in terms.items():
+            if term in index:
+                rows.append(row)
+                columns.append(index[term])
+                values.append(1 + math.log(count))
+
+    rows = np.array(rows, dtype=np.int64)
+    columns = np.array(columns, dtype=np.int64)
+    values = np.array(values) * idf[columns] if columns.size else np.array([])
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=n))
+    values = values / norms[rows] if rows.size else values
+    return rows, columns, values, vocabulary
+
+
+def similarities(rows, columns, values, centroids, n):
+    # Cosine similarity of every document to every centroid, shape (n, k)
+    return np.column_stack([
+        np.bincount(rows, weights=values * centroid[columns], minlength=n)
+        for centroid in centroids
+    ])
+
+
+def cluster(corpus, k=CLUSTERS, keywords=KEYWORDS, representatives=REPRESENTATIVES):
+    # Spherical k-means over the corpus, weighting each item by the log of its
+    # views or score. Returns the clusters, heaviest first, as dicts with their
+    # 'size', total 'weight', top 'keywords' and most 'representative' titles.
+    n = len(corpus)
+    rows, columns, values, vocabulary = tfidf(corpus.texts)
+    documents = np.unique(rows)
+    k = min(k, documents.size)
+    if k == 0:
+        return []
+
+    weights = np.log1p(np.array(corpus.weights, dtype=float)) + 1
+
+    def dense(row):
+        vector = np.zeros(len(vocabulary))
+        vector[columns[rows == row]] = values[rows == row]
+        return vector
+
+    # Farthest-first initialization from the heaviest document keeps it deterministic
+    centroids = [dense(documents[np.argmax(weights[documents])])]
+    while len(centroids) < k:
+        closest = similarities(rows, columns, values, centroids, n)[documents].max(axis=1)
+        centroids.append(dense(documents[np.argmax((1 - closest) * weights[documents])]))
+    centroids = np.array(centroids)
+
+    labels = None
+    for _ in range(ITERATIONS):
+        scores = similarities(rows, columns, values, centroids, n)
+        new_labels = scores.argmax(axis=1)
+        if labels is not None and np.array_equal(new_labels[documents], labels[documents]):
+            break
+        labels = new_labels
+
+        for j in range(k):
+            member = labels[rows] == j
+            centroid = np.bincount(
+                columns[member], weights=values[member] * weights[rows[member]], minlength=len(vocabulary)
+            )
+            norm = np.linalg.norm(centroid)
+            if norm:
+                centroids[j] = centroid / norm
+
+    raw_weights = np.array(corpus.weights, dtype=float)
+    clusters = []
+    for j in range(k):
+        members = documents[labels[documents] == j]
+        if not members.size:
+            continue
+        fit = scores[members, j] * weights[members]
+        best = members[np.argsort(-fit, kind='stable')[:representatives]]
+        clusters.append({
+            'size': int(members.size),
+            'weight': float(raw_weights[members].sum()),
+            'keywords': [vocabulary[i] for i in np.argsort(-centroids[j], kind='stable')[:keywords] if centroids[j][i] > 0],
+            'representatives': [corpus.titles[i] for i in best],
+        })
+
+    return sorted(clusters, key=lambda c: -c['weight'])
+
+
+def prompt_items(clusters, unit, measure):
+    # (title, body) pairs for prompts.build_prompt: a header line per cluster
+    # with its representative titles underneath
+    total = sum(c['weight'] for c in clusters) or 1
+    return [
+        (
+            f"{', '.join(c['keywords'])} ({c['size']} {unit}, {c['weight'] / total:.0%} of all {measure})",
+            '\n'.join(c['representatives'])
+        )
+        for c in clusters
+    ]
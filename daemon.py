@@ -0,0 +1,178 @@
+# Runs the reports as a resident service instead of one cold process per run.
+# The API clients, the Gemini topic service, the response cache, the snapshot
+# history, the fonts and the card rendering processes are set up once, and the
+# HTTP connections stay open in the clients' pools between runs, so a run only
+# costs the data work. The Reddit and YouTube reports run on their own intervals,
+# and a report can be run on demand through a local HTTP trigger:
+#
+#   python daemon.py --reddit-every 60 --youtube-every 360
+#   curl -X POST 'http://127.0.0.1:8765/run?sources=reddit'
+#   curl http://127.0.0.1:8765/status
+#
+# Runs never overlap: a trigger that arrives during a run waits for it to finish.
+# Each run's metrics overwrite the --metrics file.
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import argparse
+import json
+import threading
+import time
+
+from dotenv import load_dotenv
+import pytz
+
+from cards import load_fonts
+from metrics import Metrics
+from pipeline import SOURCES, add_arguments, build_clients, run_reports
+import youtube_trends
+
+HOST = '127.0.0.1'
+PORT = 8765
+REDDIT_EVERY = 60
+YOUTUBE_EVERY = 6 * 60
+
+
+def add_daemon_arguments(parser):
+    parser.add_argument('--host', default=HOST,
+                        help=f"Address the trigger listens on (default: {HOST})")
+    parser.add_argument('--port', type=int, default=PORT,
+                        help=f"Port the trigger listens on (default: {PORT})")
+    parser.add_argument('--reddit-every', type=float, default=REDDIT_EVERY,
+                        help=f"Minutes between scheduled Reddit reports, 0 for on demand only (default: {REDDIT_EVERY})")
+    parser.add_argument('--youtube-every', type=float, default=YOUTUBE_EVERY,
+                        help=f"Minutes between scheduled YouTube reports, 0 for on demand only (default: {YOUTUBE_EVERY})")
+
+
+class ReportService:
+    # The clients of pipeline.build_clients, kept for every run
+    def __init__(self, args):
+        self.args = args
+        self.metrics = Metrics()
+        self.clients = build_clients(args, self.metrics)
+        self.lock = threading.Lock()
+        self.runs = {}
+
+    def warm_up(self):
+        # Load the SDKs, build the API clients and parse the fonts now rather
+        # than in the first run. Offline runs never need the SDKs.
+        if not (self.args.offline or self.args.render_only):
+            self.clients['youtube'].youtube.load()
+            self.clients['topic_service'].client.load()
+            reddit = self.clients['reddit']
+            reddit.pool.put(reddit.make_reddit())
+        load_fonts()
+
+    def run(self, sources):
+        # Run the given reports (in parallel, like pipeline.py) with fresh metrics
+        # and quota budget; returns a summary of the run
+        with self.lock:
+            metrics = self.metrics = Metrics()
+            for name in ('topic_service', 'images', 'cards', 'reddit', 'youtube'):
+                if self.clients[name] is not None:
+                    self.clients[name].metrics = metrics
+            self.clients['youtube'].limiter.reset()
+
+            start = time.perf_counter()
+            try:
+                failed = run_reports(self.args, metrics, self.clients, sources)
+            finally:
+                metrics.write(self.args.metrics)
+
+            run = {
+                'sources': sources,
+                'finished_at': datetime.now(pytz.UTC).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'seconds': round(time.perf_counter() - start, 3),
+                'failed': failed,
+            }
+            for source in sources:
+                self.runs[source] = run
+            return run
+
+    def close(self):
+        if self.clients['cards'] is not None:
+            self.clients['cards'].close()
+
+
+def trigger_handler(service):
+    class TriggerHandler(BaseHTTPRequestHandler):
+        # POST /run[?sources=reddit,videos] runs reports and answers with the
+        # run's summary; GET /status shows the last run of every source
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != '/run':
+                return self.reply(404, {'error': 'not found'})
+            sources = [
+                source for value in parse_qs(url.query).get('sources', []) for source in value.split(',')
+            ] or service.args.sources
+            unknown = [source for source in sources if source not in SOURCES]
+            if unknown:
+                return self.reply(400, {'error': f"unknown sources: {', '.join(unknown)}"})
+            self.reply(200, service.run(list(dict.fromkeys(sources))))
+
+        def do_GET(self):
+            if urlparse(self.path).path != '/status':
+                return self.reply(404, {'error': 'not found'})
+            self.reply(200, service.runs)
+
+        def reply(self, status, body):
+            data = json.dumps(body, indent=2).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return TriggerHandler
+
+
+def schedule(args):
+    # (seconds between runs, sources) for each report that runs on a schedule
+    reddit = [source for source in args.sources if source == 'reddit']
+    youtube = [source for source in args.sources if source in youtube_trends.FORMATS]
+    return [
+        (every * 60, sources)
+        for every, sources in ((args.reddit_every, reddit), (args.youtube_every, youtube))
+        if every > 0 and sources
+    ]
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Run the trend reports on a schedule and on demand")
+    add_arguments(parser)
+    add_daemon_arguments(parser)
+    args = parser.parse_args()
+
+    service = ReportService(args)
+    service.warm_up()
+
+    server = ThreadingHTTPServer((args.host, args.port), trigger_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Listening on http://{args.host}:{server.server_port}")
+
+    # Every scheduled report runs right away, then at its interval; reports that
+    # come due together run together
+    jobs = schedule(args)
+    due = [time.monotonic()] * len(jobs)
+    try:
+        while True:
+            now = time.monotonic()
+            ready = [i for i in range(len(jobs)) if due[i] <= now]
+            if ready:
+                run = service.run([source for i in ready for source in jobs[i][1]])
+                print(f"{', '.join(run['sources'])} finished in {run['seconds']:.1f}s")
+                for i in ready:
+                    due[i] = now + jobs[i][0]
+                continue
+            time.sleep(min(due) - now if due else 3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
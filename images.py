@@ -0,0 +1,199 @@
+# Encodes the report cards for publishing. The cards are flat-colour charts, so
+# the PNG is written with a palette, which roughly halves its size. A card can
+# also be written as lossless WebP (smaller again) and as SVG, drawn straight
+# from the layout plan without rasterizing. The encode time and size of every
+# file written go into the run's metrics.
+#
+# --image-effort trades encode time for size:
+#   fast      palette from a 4x downsampled copy, fastest zlib level
+#   balanced  palette from a 2x downsampled copy, default zlib level
+#   small     palette from the full image, maximum zlib level and optimization
+# A card with at most 256 colours always gets an exact palette. Otherwise the
+# palette starts with every colour the plan draws with (the background, the
+# text colours and each bar's gradient), which all stay exact, and the
+# remaining slots go to the colours covering the most pixels of the sampled
+# copy. Only the antialiased edges of the text (under 2% of the pixels) are
+# mapped to a nearby colour.
+from xml.sax.saxutils import escape
+import io
+import time
+
+from PIL import Image, ImageColor
+
+from layout import BACKGROUND
+from metrics import Metrics
+from render import draw_report, gradient_strip
+
+IMAGE_FORMATS = ['png', 'webp', 'svg']
+EFFORTS = {
+    'fast': {'sample': 4, 'compress_level': 1, 'optimize': False, 'webp_method': 1, 'webp_quality': 50},
+    'balanced': {'sample': 2, 'compress_level': 6, 'optimize': False, 'webp_method': 2, 'webp_quality': 75},
+    'small': {'sample': 1, 'compress_level': 9, 'optimize': True, 'webp_method': 4, 'webp_quality': 100},
+}
+EFFORT = 'balanced'
+
+# Palette colours within this many levels (in every channel) of one of the plan's
+# colours are left out, see palette_image()
+NEAR = 4
+DPI = 300
+
+# Pillow puts multiline text this many pixels apart on top of the height of an "A"
+LINE_SPACING = 4
+
+
+def add_image_arguments(parser):
+    parser.add_argument('--image-formats', nargs='+', choices=IMAGE_FORMATS, default=['png'],
+                        help="Formats to write each report card in (default: png)")
+    parser.add_argument('--image-effort', choices=EFFORTS, default=EFFORT,
+                        help=f"Encode faster or smaller (default: {EFFORT})")
+
+
+def plan_colors(plan, gradient):
+    # Every colour a plan is drawn with: the background, the text colours and
+    # each bar's gradient
+    colors = [BACKGROUND] + [ImageColor.getrgb(text['fill']) for text in plan['texts']]
+    for bar in plan['bars']:
+        if bar['width'] > 0:
+            colors.extend(color for _, color in gradient_strip(bar['width'], *gradient).getcolors(bar['width']))
+    return list(dict.fromkeys(tuple(color) for color in colors))
+
+
+def near(color, colors, distance):
+    return any(max(abs(a - b) for a, b in zip(color, other)) <= distance for other in colors)
+
+
+def palette_image(img, sample, plan=None, gradient=None):
+    # Exact palette when the card has few enough colours. Otherwise the palette
+    # starts with the plan's colours and is filled up with the colours that
+    # cover the most pixels of a downsampled copy.
+    if img.getcolors(256) is not None:
+        return img.quantize(256, method=Image.Quantize.MAXCOVERAGE, dither=Image.Dither.NONE)
+    colors = plan_colors(plan, gradient)[:256] if plan else []
+    palette = colors[:]
+    if len(palette) < 256:
+        coverage = (img.reduce(sample) if sample > 1 else img).quantize(
+            256 - len(palette), method=Image.Quantize.MAXCOVERAGE, dither=Image.Dither.NONE
+        )
+        flat = coverage.getpalette()[:3 * (256 - len(palette))]
+        # Pillow maps pixels to the palette through an approximate colour
+        # cache, which can pick a close neighbour over an exact entry, so no
+        # colours are added right next to the plan's
+        palette.extend(
+            color for color in zip(flat[0::3], flat[1::3], flat[2::3]) if not near(color, colors, NEAR)
+        )
+    # Pad with the background rather than leave black in the unused slots
+    palette += [palette[0]] * (256 - len(palette))
+
+    palette_img = Image.new('P', (1, 1))
+    palette_img.putpalette([channel for color in palette for channel in color])
+    quantized = img.quantize(palette=palette_img, dither=Image.Dither.NONE)
+    if plan:
+        paste_bars(quantized, plan, gradient, {color: i for i, color in enumerate(colors)})
+    return quantized
+
+
+def paste_bars(quantized, plan, gradient, index):
+    # The bars have no text drawn over them, so they are pasted straight from
+    # their gradient strips with the palette entries of the strips' colours
+    for bar in plan['bars']:
+        if bar['width'] <= 0:
+            continue
+        strip = gradient_strip(bar['width'], *gradient).tobytes()
+        colors = list(zip(strip[0::3], strip[1::3], strip[2::3]))
+        if all(color in index for color in colors):
+            row = Image.frombytes('P', (bar['width'], 1), bytes(index[color] for color in colors))
+            quantized.paste(row.resize((bar['width'], bar['height']), Image.NEAREST), bar['xy'])
+
+
+def encode_png(img, effort, plan=None, gradient=None):
+    # With the plan the card was drawn from, its colours come out exact
+    settings = EFFORTS[effort]
+    f = io.BytesIO()
+    palette_image(img, settings['sample'], plan, gradient).save(
+        f, 'PNG', dpi=(DPI, DPI), compress_level=settings['compress_level'], optimize=settings['optimize']
+    )
+    return f.getvalue()
+
+
+def encode_webp(img, effort):
+    # Lossless, so the card looks exactly like the drawn one
+    settings = EFFORTS[effort]
+    f = io.BytesIO()
+    img.save(f, 'WEBP', lossless=True, method=settings['webp_method'], quality=settings['webp_quality'])
+    return f.getvalue()
+
+
+def hex_color(color):
+    return color if isinstance(color, str) else '#%02x%02x%02x' % color
+
+
+def encode_svg(plan, gradient):
+    # The plan as SVG: bars as rects sharing one gradient, texts as text
+    # elements with a tspan per line. Pillow positions text by the top of its
+    # ascender while SVG uses the baseline, so each line is moved down by the
+    # font's ascent.
+    start, end = gradient
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{plan["width"]}" height="{plan["height"]}" '
+        f'viewBox="0 0 {plan["width"]} {plan["height"]}">',
+        f'<defs><linearGradient id="bar"><stop offset="0" stop-color="{hex_color(start)}"/>'
+        f'<stop offset="1" stop-color="{hex_color(end)}"/></linearGradient></defs>',
+        f'<rect width="100%" height="100%" fill="{hex_color(BACKGROUND)}"/>',
+    ]
+
+    for bar in plan['bars']:
+        if bar['width'] > 0:
+            x, y = bar['xy']
+            parts.append(f'<rect x="{x}" y="{y}" width="{bar["width"]}" height="{bar["height"]}" fill="url(#bar)"/>')
+
+    for text in plan['texts']:
+        font = text['font']
+        x, y = text['xy']
+        ascent = font.getmetrics()[0]
+        line_height = font.getbbox('A')[3] + LINE_SPACING
+        weight = ' font-weight="bold"' if font.font.style == 'Bold' else ''
+        lines = ''.join(
+            f'<tspan x="{x}" y="{y + ascent + i * line_height}">{escape(line)}</tspan>'
+            for i, line in enumerate(text['text'].split('\n'))
+        )
+        parts.append(
+            f'<text font-family="{font.font.family}, Arial, sans-serif" font-size="{font.size}"{weight} '
+            f'fill="{hex_color(text["fill"])}" xml:space="preserve">{lines}</text>'
+        )
+
+    parts.append('</svg>\n')
+    return '\n'.join(parts).encode('utf-8')
+
+
+class ImageWriter:
+    # Writes each report card as `<stem>.<format>` for every requested format.
+    # The raster formats share one drawing of the plan; an SVG-only run never
+    # draws it at all.
+    def __init__(self, formats=('png',), effort=EFFORT, metrics=None):
+        self.formats = list(dict.fromkeys(formats))
+        self.effort = effort
+        self.metrics = metrics or Metrics()
+
+    @classmethod
+    def from_args(cls, args, metrics=None):
+        return cls(args.image_formats, args.image_effort, metrics)
+
+    def save(self, plan, gradient, stem):
+        img = None
+        for image_format in self.formats:
+            if image_format != 'svg' and img is None:
+                img = draw_report(plan, gradient)
+
+            start = time.perf_counter()
+            if image_format == 'png':
+                data = encode_png(img, self.effort, plan, gradient)
+            elif image_format == 'webp':
+                data = encode_webp(img, self.effort)
+            else:
+                data = encode_svg(plan, gradient)
+            seconds = time.perf_counter() - start
+
+            path = f'{stem}.{image_format}'
+            with open(path, 'wb') as f:
+                f.write(data)
+            self.metrics.output(path, image_format, seconds, len(data))
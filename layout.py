@@ -0,0 +1,113 @@
+# Layout of the trend report cards, shared by the report scripts.
+# plan_report() wraps and measures every text block once and returns a plan
+# (image size plus positioned bars and texts) that render.draw_report() draws.
+from functools import lru_cache
+
+from PIL import ImageFont
+
+# Image dimensions
+WIDTH = 2000
+MARGIN = 80
+BAR_HEIGHT = 40
+MAX_BAR_WIDTH = 1000
+
+# Widest a line of topics or a title may get before wrapping, in pixels
+TOPICS_WIDTH = WIDTH - 2 * MARGIN
+TITLE_WIDTH = 1300
+
+# Colors
+BACKGROUND = (250, 250, 250)
+BLUE = '#0066CC'
+DARK_GRAY = '#1a1a1a'
+GRAY = '#404040'
+
+
+@lru_cache(maxsize=None)
+def load_font(path, size):
+    # Fonts are parsed from the TTF files once per process
+    return ImageFont.truetype(path, size)
+
+
+def title_font():
+    return load_font("./Helvetica-Bold.ttf", 60)
+
+
+def header_font():
+    return load_font("./Helvetica.ttf", 40)
+
+
+def body_font():
+    return load_font("./Helvetica.ttf", 30)
+
+
+def caption_font():
+    return load_font("./Helvetica.ttf", 26)
+
+
+def wrap_text(text, font, max_width):
+    # Greedy word wrap on measured pixel widths rather than character counts
+    lines = []
+    line = ''
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if line and font.getlength(candidate) > max_width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    lines.append(line)
+    return lines
+
+
+def plan_report(title, date_range, topics, section_title, entries):
+    # entries are dicts with the bar 'value', its 'label' (e.g. "1,234 views"),
+    # the item 'title' and a 'caption' line, best first
+    texts = []
+    bars = []
+
+    def add_text(xy, text, font, fill):
+        texts.append({'xy': xy, 'text': text, 'font': font, 'fill': fill})
+
+    y = MARGIN
+
+    # Title and date range
+    add_text((MARGIN, y), title, title_font(), DARK_GRAY)
+    y += 80
+    add_text((MARGIN, y), date_range, header_font(), GRAY)
+    y += 90
+
+    # Key topics
+    add_text((MARGIN, y), "Trending Topics:", header_font(), GRAY)
+    y += 60
+    topics_lines = wrap_text(", ".join(topics), body_font(), TOPICS_WIDTH)
+    add_text((MARGIN, y), '\n'.join(topics_lines), body_font(), BLUE)
+    y += (len(topics_lines) * 40) + 60
+
+    # Top items section
+    add_text((MARGIN, y), section_title, header_font(), GRAY)
+    y += 80
+
+    # Find maximum value for scaling
+    max_value = max((entry['value'] for entry in entries), default=0) or 1
+
+    for i, entry in enumerate(entries, 1):
+        bar_width = int((entry['value'] / max_value) * MAX_BAR_WIDTH)
+
+        # Rank number, bar and its label
+        add_text((MARGIN - 50, y + 5), f"{i}.", body_font(), GRAY)
+        bars.append({'xy': (MARGIN, y), 'width': bar_width, 'height': BAR_HEIGHT + 1})
+        add_text((MARGIN + bar_width + 15, y + 5), entry['label'], body_font(), GRAY)
+
+        # Wrapped title in blue, then the caption underneath
+        title_lines = wrap_text(entry['title'], body_font(), TITLE_WIDTH)
+        add_text((MARGIN, y + BAR_HEIGHT + 10), '\n'.join(title_lines), body_font(), BLUE)
+        add_text((MARGIN, y + BAR_HEIGHT + 15 + (len(title_lines) * 35)), entry['caption'], caption_font(), GRAY)
+
+        y += BAR_HEIGHT + 50 + (len(title_lines) * 35) + 30
+
+    return {
+        'width': WIDTH,
+        'height': y + MARGIN,
+        'bars': bars,
+        'texts': texts,
+    }
@@ -0,0 +1,132 @@
+# Topic extraction with Gemini, shared by the report scripts
+import asyncio
+import random
+import threading
+import time
+
+from cache import CacheMiss
+from metrics import Metrics
+
+MODEL = 'gemini-2.0-flash-exp'
+
+TIMEOUT = 60
+RETRIES = 3
+BACKOFF = 2
+CONCURRENCY = 4
+
+
+def add_llm_arguments(parser):
+    parser.add_argument('--llm-timeout', type=float, default=TIMEOUT,
+                        help=f"Seconds to wait for one Gemini response before retrying (default: {TIMEOUT})")
+    parser.add_argument('--llm-retries', type=int, default=RETRIES,
+                        help=f"Times to retry a failed or timed out Gemini request (default: {RETRIES})")
+    parser.add_argument('--llm-concurrency', type=int, default=CONCURRENCY,
+                        help=f"Maximum Gemini requests in flight at once (default: {CONCURRENCY})")
+
+
+def retryable(error):
+    # Timeouts, connection errors, rate limiting and server errors are worth
+    # another try; a rejected request (any other 4xx), an unexpected response or
+    # a bug would only fail again
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+
+    # The SDK and its HTTP client are loaded by the time a request has failed
+    import httpx
+    from google.genai import errors
+
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, errors.APIError) and isinstance(error.code, int) and (
+        error.code == 429 or error.code >= 500
+    )
+
+
+class TopicService:
+    # Sends topic extraction requests through the async Gemini client on an
+    # event loop of its own, so report threads can submit requests side by side
+    # and get futures back. At most `concurrency` requests are in flight; each
+    # attempt gets `timeout` seconds, and failed attempts are retried up to
+    # `retries` times with exponential backoff and jitter.
+    #
+    # Results are memoized in the response cache under a hash of everything that
+    # determines the answer (prompt, model, temperature and schema), so rerunning
+    # a report on unchanged inputs never calls the LLM.
+    def __init__(self, client, cache=None, metrics=None, timeout=TIMEOUT, retries=RETRIES,
+                 backoff=BACKOFF, concurrency=CONCURRENCY):
+        self.client = client
+        self.cache = cache
+        self.metrics = metrics or Metrics()
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.concurrency = concurrency
+        self.loop = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_args(cls, args, client, cache=None, metrics=None):
+        return cls(client, cache, metrics, args.llm_timeout, args.llm_retries,
+                   concurrency=args.llm_concurrency)
+
+    def submit(self, prompt, model=MODEL, temperature=0.5, schema=None):
+        # Start extracting the topics of prompt and return a concurrent.futures.Future
+        # of the schema instance (schemas.topics by default)
+        if schema is None:
+            from schemas import topics
+            schema = topics
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.semaphore = asyncio.Semaphore(self.concurrency)
+                threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(self.extract(prompt, model, temperature, schema), self.loop)
+
+    async def extract(self, prompt, model, temperature, schema):
+        self.metrics.call('gemini.generate_content')
+        if self.cache is None:
+            return schema(**await self.generate(prompt, model, temperature, schema))
+
+        params = {
+            'model': model,
+            'temperature': temperature,
+            'schema': schema.model_json_schema(),
+            'prompt': prompt,
+        }
+        value = self.cache.get('gemini.generate_content', params)
+        if value is None:
+            if self.cache.offline:
+                raise CacheMiss(f"No cached response for gemini.generate_content {params}")
+            value = await self.generate(prompt, model, temperature, schema)
+            self.cache.set('gemini.generate_content', params, value)
+        return schema(**value)
+
+    async def generate(self, prompt, model, temperature, schema):
+        # Only imported once a prompt actually has to go to Gemini
+        from google.genai import types
+
+        config = types.GenerateContentConfig(
+            response_mime_type='application/json',
+            response_schema=schema,
+            temperature=temperature
+        )
+
+        for attempt in range(self.retries + 1):
+            # Waiting out the backoff doesn't hold up other requests
+            async with self.semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await asyncio.wait_for(
+                        self.client.aio.models.generate_content(model=model, contents=prompt, config=config),
+                        self.timeout
+                    )
+                    return response.parsed.model_dump()
+                except Exception as e:
+                    if attempt == self.retries or not retryable(e):
+                        raise
+                    print(f"An error occurred: {str(e) or type(e).__name__}")
+                    print("Retrying Gemini request, attempt", attempt + 2)
+                finally:
+                    self.metrics.request('gemini.generate_content', time.perf_counter() - start)
+
+            await asyncio.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
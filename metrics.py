@@ -0,0 +1,151 @@
+# Run metrics shared by the report scripts: API calls and quota units per
+# endpoint, request latency histograms per endpoint and per channel or
+# subreddit, and how long each stage (fetch, llm, render, export) of each report
+# took, and how long each image written took to encode and how big it is.
+# Everything is written to a JSON file at the end of the run.
+#
+# Stages that stream overlap: a YouTube report's CSV rows are written while it
+# is still fetching, so its 'export' time is also part of its 'fetch' time.
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import threading
+import time
+
+import pytz
+
+METRICS_PATH = 'metrics.json'
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument('--metrics', default=METRICS_PATH,
+                        help=f"Where to write this run's metrics as JSON (default: {METRICS_PATH})")
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self):
+        # Bucket counts aren't cumulative: each holds the requests that took
+        # longer than the previous bound and at most its own
+        bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+        return {
+            'count': self.count,
+            'seconds': round(self.total, 6),
+            'mean': round(self.total / self.count, 6) if self.count else 0,
+            'max': round(self.max, 6),
+            'buckets': dict(zip(bounds, self.counts)),
+        }
+
+
+class Metrics:
+    # Thread safe, so one instance can be shared by all the workers and reports
+    # of a run. Requests sent while a thread is inside scope() are also
+    # attributed to that scope, e.g. to the channel whose playlist is being walked.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started_at = datetime.now(pytz.UTC)
+        self.start = time.perf_counter()
+        self.endpoints = defaultdict(lambda: {'calls': 0, 'requests': 0, 'quota_units': 0, 'latency': Histogram()})
+        self.scopes = defaultdict(lambda: defaultdict(
+            lambda: {'seconds': 0.0, 'requests': 0, 'quota_units': 0, 'latency': Histogram()}
+        ))
+        self.stages = defaultdict(lambda: defaultdict(lambda: {'seconds': 0.0, 'count': 0}))
+        self.outputs = {}
+
+    def call(self, endpoint):
+        # An API call was made, whether or not the response cache answered it
+        with self.lock:
+            self.endpoints[endpoint]['calls'] += 1
+
+    def request(self, endpoint, seconds, quota_units=0):
+        # A request actually went out to the API
+        scope = getattr(self.local, 'scope', None)
+        with self.lock:
+            targets = [self.endpoints[endpoint]]
+            if scope:
+                targets.append(self.scopes[scope[0]][scope[1]])
+            for target in targets:
+                target['requests'] += 1
+                target['quota_units'] += quota_units
+                target['latency'].observe(seconds)
+
+    @contextmanager
+    def scope(self, group, name):
+        # Attribute the requests of this thread to e.g. ('channels', 'Nischa')
+        # and time the whole block
+        previous = getattr(self.local, 'scope', None)
+        self.local.scope = (group, name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.local.scope = previous
+            with self.lock:
+                self.scopes[group][name]['seconds'] += time.perf_counter() - start
+
+    @contextmanager
+    def stage(self, report, name):
+        # Time a stage of a report; a stage entered several times adds up
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                stage = self.stages[report][name]
+                stage['seconds'] += time.perf_counter() - start
+                stage['count'] += 1
+
+    def output(self, path, image_format, seconds, size):
+        # An image was encoded and written to path
+        with self.lock:
+            self.outputs[path] = {'format': image_format, 'seconds': seconds, 'bytes': size}
+
+    def to_dict(self):
+        with self.lock:
+            def endpoint_dict(endpoint):
+                return dict(endpoint, latency=endpoint['latency'].to_dict())
+
+            def seconds(entry):
+                return dict(entry, seconds=round(entry['seconds'], 6))
+
+            return {
+                'started_at': self.started_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'seconds': round(time.perf_counter() - self.start, 6),
+                'quota_units': sum(endpoint['quota_units'] for endpoint in self.endpoints.values()),
+                'endpoints': {name: endpoint_dict(endpoint) for name, endpoint in sorted(self.endpoints.items())},
+                'scopes': {
+                    group: {name: seconds(endpoint_dict(scope)) for name, scope in scopes.items()}
+                    for group, scopes in self.scopes.items()
+                },
+                'stages': {
+                    report: {name: seconds(stage) for name, stage in stages.items()}
+                    for report, stages in self.stages.items()
+                },
+                'outputs': {path: seconds(output) for path, output in sorted(self.outputs.items())},
+            }
+
+    def write(self, path=METRICS_PATH):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
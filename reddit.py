@@ -1,34 +1,21 @@
-import praw
-from google import genai
-from google.genai import types
-from pydantic import BaseModel
-from PIL import Image, ImageDraw, ImageFont
 from datetime import datetime, timedelta
-import textwrap
 from dotenv import load_dotenv
-import os
-
-
-load_dotenv()
-# Get API keys from the environment
-client_id = os.getenv("REDDIT_CLIENT_ID")
-client_secret = os.getenv("REDDIT_CLIENT_SECRET")
-gemini_key = os.getenv("GEMINI_KEY")
-
-reddit = praw.Reddit(
-    client_id=client_id,
-    client_secret=client_secret,
-    user_agent="windows:trends-script:v1.0 (by /u/bitesh9)",
-)
-
-class topics(BaseModel):
-    topic1: str
-    topic2: str
-    topic3: str
-    topic4: str
-    topic5: str
-    topic6: str
-    topic7: str
+import argparse
+import sys
+from cache import CacheMiss, ResponseCache, add_cache_arguments
+from cards import CardCollector, CardRenderer, add_card_arguments, slug
+from clients import gemini_client, reddit_client
+from clustering import CLUSTERS, Corpus, add_cluster_arguments, cluster, prompt_items
+from llm import TopicService, add_llm_arguments
+from metrics import Metrics, add_metrics_arguments
+from prompts import PROMPT_TOKENS, add_prompt_arguments, build_prompt
+from records import Post
+from snapshots import SnapshotStore, add_snapshot_arguments
+from images import ImageWriter, add_image_arguments
+from layout import plan_report
+from render import REDDIT_GRADIENT
+from throttle import iter_concurrently
+from topk import TopK
 
 subs = [
     "personalfinance", 
@@ -46,143 +33,156 @@ subs = [
     "ValueInvesting"     
 ]
 
-posts = []
-
-for sub in subs:
-    for submission in reddit.subreddit(sub).top(time_filter="week", limit=10):
-        post = {
-            "subreddit": submission.subreddit.display_name,
-            "title": submission.title,
-            "url": submission.url,
-            "body": submission.selftext,
-            "score": submission.score,
+def get_top_posts(reddit, sub, limit=10):
+    try:
+        posts = []
+        with reddit.metrics.scope('subreddits', sub):
+            submissions = reddit.top(sub, time_filter="week", limit=limit)
+        for submission in submissions:
+            post = Post(
+                id=submission['id'],
+                subreddit=submission['subreddit'],
+                title=submission['title'],
+                url=submission['url'],
+                body=submission['selftext'],
+                score=submission['score'],
+            )
+            posts.append(post)
+        return posts
+
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        print("Subreddit:", sub)
+        return []
+
+def collect_posts(reddit, workers=1):
+    # Fetch subreddits in parallel when workers > 1; posts stream on in subs order
+    for sub_posts in iter_concurrently(lambda sub: get_top_posts(reddit, sub), subs, workers):
+        yield from sub_posts
+
+def summarize_posts(topic_service, top_10, prompt_tokens=PROMPT_TOKENS, topic_clusters=None):
+    # Returns a future of the key topics. Given topic_clusters of every collected
+    # post (see clustering.py), the prompt summarizes those instead of the top 10.
+    # Post bodies can run to thousands of words, so they are cleaned and cut
+    # down to fit the prompt budget
+    if topic_clusters:
+        return topic_service.submit(build_prompt("The following are clusters of this week's top personal finance related posts on Reddit, each with its keywords, its share of all upvotes and its most representative post titles. Please, identify common themes and come up with 7 key topics that are discussed in these posts, giving more weight to the bigger clusters: \n\n", prompt_items(topic_clusters, 'posts', 'upvotes'), prompt_tokens))
+    return topic_service.submit(build_prompt("The following are the 10 of the top posts personal finance related posts from the past week on Reddit. Please, identify common themes and come up with 7 key topics that are discussed in these posts: \n\n", [(post.title, post.body) for post in top_10], prompt_tokens))
+
+def get_date_range():
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=7)
+    return f"{start_date.strftime('%B %d')} - {end_date.strftime('%B %d, %Y')}"
+
+def post_entries(top):
+    return [
+        {
+            'value': post.score,
+            'label': f"{post.score:,}",
+            'title': post.title,
+            'caption': f"posted on r/{post.subreddit}",
         }
-        posts.append(post)
-
-
-# Sort posts by score in descending order
-sorted_posts = sorted(posts, key=lambda x: x['score'], reverse=True)
-top_10 = sorted_posts[:10]
-
-# Create a client for Gemini
-client = genai.Client(api_key=gemini_key)
-
-key_topics = client.models.generate_content(model='gemini-2.0-flash-exp', contents="The following are the 10 of the top posts personal finance related posts from the past week on Reddit. Please, identify common themes and come up with 7 key topics that are discussed in these posts: \n\n" + "\n\n".join([post['title'] + "\n" + post['body'] for post in top_10]), config=types.GenerateContentConfig(response_mime_type='application/json', response_schema=topics, temperature=0.5))
+        for post in top
+    ]
 
 def create_trends_visualization(top_10, key_topics):
-    # Set up image dimensions
-    WIDTH = 2000
-    MARGIN = 80
-    BAR_HEIGHT = 40
-    BAR_SPACING = 30
-    MAX_BAR_WIDTH = 1000
-    
-    # Colors
-    BLUE = '#0066CC'
-    DARK_GRAY = '#1a1a1a'
-    GRAY = '#404040'
-
-    # Load fonts
-
-    title_font = ImageFont.truetype("./Helvetica-Bold.ttf", 60)
-    header_font = ImageFont.truetype("./Helvetica.ttf", 40)
-    body_font = ImageFont.truetype("./Helvetica.ttf", 30)
-    subreddit_font = ImageFont.truetype("./Helvetica.ttf", 26) 
-
-    # Calculate required height
-    y = MARGIN
-
-    # Space for title and date
-    y += 80  # Title
-    y += 90  # Date
-
-    # Space for topics
-    topics_list = list(key_topics.parsed.dict().values())
-    topics_text = ", ".join(topics_list)
-    wrapped_topics = textwrap.fill(topics_text, width=120)
-    topics_lines = wrapped_topics.count('\n') + 1
-    y += 60  # "Trending Topics" header
-    y += (topics_lines * 40) + 60  # Topics text + spacing
-
-    # Space for posts header
-    y += 80
-
-    # Calculate space needed for posts
-    for post in top_10:
-        wrapped_title = textwrap.fill(post['title'], width=85)
-        title_lines = wrapped_title.count('\n') + 1
-        y += BAR_HEIGHT + 50 + (title_lines * 35) + 30  # Added extra space for subreddit
-
-    # Add final margin
-    HEIGHT = y + MARGIN
-
-    # Create image
-    img = Image.new('RGB', (WIDTH, HEIGHT), (250, 250, 250))
-    draw = ImageDraw.Draw(img)
-
-    # Reset y for actual drawing
-    y = MARGIN
-
-    # Draw title and date range
-    draw.text((MARGIN, y), "Reddit Personal Finance Trends", font=title_font, fill=DARK_GRAY)
-    y += 80
-
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=7)
-    date_range = f"{start_date.strftime('%B %d')} - {end_date.strftime('%B %d, %Y')}"
-    draw.text((MARGIN, y), date_range, font=header_font, fill=GRAY)
-    y += 90
-
-    # Draw key topics in a single line
-    draw.text((MARGIN, y), "Trending Topics:", font=header_font, fill=GRAY)
-    y += 60
-    draw.text((MARGIN, y), wrapped_topics, font=body_font, fill=BLUE)  # Topics in blue
-    y += (topics_lines * 40) + 60
-
-    # Draw top posts section
-    draw.text((MARGIN, y), "Most Popular Posts This Week:", font=header_font, fill=GRAY)
-    y += 80
-
-    # Find maximum score for scaling
-    max_score = max(post['score'] for post in top_10)
-
-    # Draw bars and titles
-    for i, post in enumerate(top_10, 1):
-        # Calculate bar width
-        bar_width = int((post['score'] / max_score) * MAX_BAR_WIDTH)
-        
-        # Draw rank number
-        draw.text((MARGIN - 50, y + 5), f"{i}.", font=body_font, fill=GRAY)
-        
-        # Draw bar with gradient effect
-        for x in range(bar_width):
-            color = (
-                min(255, int(255 - (x/bar_width) * 40)),
-                min(128, int(69 - (x/bar_width) * 20)),
-                min(0, int(0 + (x/bar_width) * 10))
-            )
-            draw.line([(MARGIN + x, y), (MARGIN + x, y + BAR_HEIGHT)], fill=color)
-        
-        # Draw score
-        score_text = f"{post['score']:,}"
-        score_width = draw.textlength(score_text, font=body_font)
-        draw.text((MARGIN + bar_width + 15, y + 5), score_text, font=body_font, fill=GRAY)
-        
-        # Wrap and draw title in blue
-        wrapped_title = textwrap.fill(post['title'], width=85)
-        draw.text((MARGIN, y + BAR_HEIGHT + 10), wrapped_title, font=body_font, fill=BLUE)
-        
-        # Draw subreddit info
-        subreddit_text = f"posted on r/{post['subreddit']}"
-        title_lines = wrapped_title.count('\n') + 1
-        subreddit_y = y + BAR_HEIGHT + 15 + (title_lines * 35)
-        draw.text((MARGIN, subreddit_y), subreddit_text, font=subreddit_font, fill=GRAY)
-        
-        # Calculate space for next entry
-        y += BAR_HEIGHT + 50 + (title_lines * 35) + 30  # Added extra space for subreddit
-
-    return img
-
-# Create and save the visualization
-viz = create_trends_visualization(top_10, key_topics)
-viz.save('reddit_trends.png', dpi=(300, 300))
+    return plan_report(
+        "Reddit Personal Finance Trends",
+        get_date_range(),
+        list(key_topics.dict().values()),
+        "Most Popular Posts This Week:",
+        post_entries(top_10)
+    )
+
+def subreddit_cards(card_items):
+    # A card spec per subreddit (see cards.py)
+    date_range = get_date_range()
+    return [
+        {
+            'stem': f"reddit_{slug(sub)}",
+            'title': f"r/{sub} - Reddit Trends",
+            'date_range': date_range,
+            'topics': topics,
+            'section_title': "Most Popular Posts This Week:",
+            'entries': post_entries(top),
+            'gradient': REDDIT_GRADIENT,
+        }
+        for sub, top, topics in card_items.groups()
+    ]
+
+def run(reddit, topic_service, workers=1, prompt_tokens=PROMPT_TOKENS, clusters=CLUSTERS, store=None, images=None,
+        cards=None):
+    # Fetch, summarize and render the weekly Reddit report
+    # Keep the 10 highest scoring posts without holding or sorting all of them;
+    # every post's text goes to the corpus that is clustered for the topics
+    metrics = reddit.metrics
+    posts = collect_posts(reddit, workers)
+    if store is not None:
+        # Every post's score goes into the daily rollups as it streams past
+        posts = store.record(posts)
+    corpus = Corpus() if clusters else None
+    top_posts = TopK(10, metrics=('score',), spill=(
+        (lambda post: corpus.add(post.title, post.body, post.score)) if corpus is not None else None
+    ))
+    card_items = CardCollector('score') if cards is not None else None
+    with metrics.stage('reddit', 'fetch'):
+        for post in posts:
+            top_posts.add(post)
+            if card_items is not None:
+                card_items.add(post.subreddit, post)
+    top_10 = top_posts.top()
+
+    topic_clusters = None
+    if corpus is not None:
+        with metrics.stage('reddit', 'cluster'):
+            topic_clusters = cluster(corpus, clusters)
+
+    with metrics.stage('reddit', 'llm'):
+        key_topics = summarize_posts(topic_service, top_10, prompt_tokens, topic_clusters).result()
+
+    # Create and save the visualization
+    with metrics.stage('reddit', 'render'):
+        images = images or ImageWriter(metrics=metrics)
+        images.save(create_trends_visualization(top_10, key_topics), REDDIT_GRADIENT, 'reddit_trends')
+
+    if cards is not None:
+        with metrics.stage('reddit', 'cards'):
+            cards.render(subreddit_cards(card_items))
+
+def add_arguments(parser):
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of subreddits to fetch at the same time (default: 1, one after another)")
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    add_cache_arguments(parser)
+    add_metrics_arguments(parser)
+    add_prompt_arguments(parser)
+    add_llm_arguments(parser)
+    add_cluster_arguments(parser)
+    add_snapshot_arguments(parser)
+    add_image_arguments(parser)
+    add_card_arguments(parser)
+    args = parser.parse_args()
+
+    cache = ResponseCache.from_args(args)
+    metrics = Metrics()
+    cards = CardRenderer.from_args(args, metrics)
+    try:
+        topic_service = TopicService.from_args(args, gemini_client(), cache, metrics)
+        store = SnapshotStore.from_args(args)
+        run(reddit_client(cache, metrics), topic_service, args.workers, args.prompt_tokens, args.clusters, store,
+            ImageWriter.from_args(args, metrics), cards)
+    except CacheMiss as e:
+        print(f"An error occurred: {str(e)}")
+        sys.exit(1)
+    finally:
+        if cards is not None:
+            cards.close()
+        metrics.write(args.metrics)
+
+if __name__ == '__main__':
+    main()
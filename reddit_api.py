@@ -0,0 +1,87 @@
+# Shared helpers for fetching from Reddit through PRAW
+import queue
+import threading
+import time
+
+from metrics import Metrics
+
+
+class RateLimitGate:
+    # Reddit reports what is left of the current rate-limit window in its
+    # X-Ratelimit-* response headers, which PRAW exposes as reddit.auth.limits.
+    # All worker clients use the same app credentials and so share one allowance:
+    # once it drops to `reserve` requests, every worker waits for the window to reset.
+    def __init__(self, reserve=5):
+        self.reserve = reserve
+        self.remaining = None
+        self.reset_timestamp = None
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            if self.remaining is None:
+                return
+            if self.remaining <= self.reserve and self.reset_timestamp:
+                # Sleep while holding the lock so the other workers wait too
+                time.sleep(max(0, self.reset_timestamp - time.time()))
+                self.remaining = None
+            else:
+                self.remaining -= 1
+
+    def update(self, limits):
+        with self.lock:
+            if limits.get('remaining') is not None:
+                self.remaining = limits['remaining']
+                self.reset_timestamp = limits.get('reset_timestamp')
+
+
+class RedditClient:
+    # PRAW isn't thread safe, so each request borrows a praw.Reddit of its own
+    # from a pool, building one from `make_reddit` when all are in use, and the
+    # instances share one RateLimitGate. Instances (and their HTTP sessions) go
+    # back to the pool after the request, so they stay warm for the next worker
+    # thread or run. Listings are returned as plain dicts so they can be kept in
+    # the response cache.
+    def __init__(self, make_reddit, gate=None, cache=None, metrics=None):
+        self.make_reddit = make_reddit
+        self.gate = gate or RateLimitGate()
+        self.cache = cache
+        self.metrics = metrics or Metrics()
+        self.pool = queue.SimpleQueue()
+
+    def top(self, sub, time_filter='week', limit=10):
+        self.metrics.call('reddit.top')
+        if self.cache is None:
+            return self.fetch_top(sub, time_filter, limit)
+
+        params = {'sub': sub, 'time_filter': time_filter, 'limit': limit}
+        return self.cache.fetch('reddit.top', params, lambda: self.fetch_top(sub, time_filter, limit))
+
+    def fetch_top(self, sub, time_filter, limit):
+        # Listings are fetched lazily, so read them here while we hold the slot
+        self.gate.wait()
+        try:
+            reddit = self.pool.get_nowait()
+        except queue.Empty:
+            reddit = self.make_reddit()
+        try:
+            return self.fetch_with(reddit, sub, time_filter, limit)
+        finally:
+            self.pool.put(reddit)
+
+    def fetch_with(self, reddit, sub, time_filter, limit):
+        start = time.perf_counter()
+        submissions = [
+            {
+                'id': submission.id,
+                'subreddit': submission.subreddit.display_name,
+                'title': submission.title,
+                'url': submission.url,
+                'selftext': submission.selftext,
+                'score': submission.score,
+            }
+            for submission in reddit.subreddit(sub).top(time_filter=time_filter, limit=limit)
+        ]
+        self.metrics.request('reddit.top', time.perf_counter() - start)
+        self.gate.update(reddit.auth.limits)
+        return submissions
@@ -0,0 +1,117 @@
+# Decides which videos' statistics a YouTube run re-requests. Most videos in
+# the reporting window have plateaued, and only a few are still gaining views
+# quickly. With a refresh budget, a run spends at most that many videos().list
+# quota units on statistics (50 videos per unit), filled in this order:
+#
+#   - uploads without a snapshot, since their statistics (and, for new uploads,
+#     their duration) are needed
+#   - videos whose last snapshot is older than --refresh-max-age hours, the
+#     longest unseen first
+#   - the videos expected to have gained the most views since their last
+#     snapshot: their view velocity (between their last two snapshots, or since
+#     publishing) times the hours since that snapshot
+#
+# Every other video keeps the numbers of its last snapshot for this run and is
+# marked 'stale' so the snapshot history doesn't record them again. New uploads
+# that don't fit in the budget are left out of this run's reports.
+from datetime import datetime
+
+import pytz
+
+from youtube_api import MAX_IDS_PER_REQUEST, get_video_details, parse_timestamp
+
+MAX_AGE_HOURS = 72
+
+
+def add_refresh_arguments(parser):
+    parser.add_argument('--refresh-budget', type=int,
+                        help="Quota units a run may spend refreshing statistics, new uploads and fast-growing "
+                             "videos first (default: refresh every video); needs the snapshot history")
+    parser.add_argument('--refresh-max-age', type=float, default=MAX_AGE_HOURS,
+                        help="Refresh videos last seen more than this many hours ago ahead of the fast-growing "
+                             f"ones (default: {MAX_AGE_HOURS})")
+
+
+def hours_between(earlier, later):
+    return max((later - earlier).total_seconds() / 3600, 0)
+
+
+def velocity(upload, snapshots):
+    # Views per hour between the last two snapshots, or since publishing when
+    # there's only one
+    taken_at, view_count, _ = snapshots[0]
+    if len(snapshots) > 1:
+        previous_at, previous_count, _ = snapshots[1]
+        hours = hours_between(parse_timestamp(previous_at), parse_timestamp(taken_at))
+        if hours:
+            return max(view_count - previous_count, 0) / hours
+    hours = hours_between(parse_timestamp(upload['published_at']), parse_timestamp(taken_at))
+    return view_count / max(hours, 1)
+
+
+class RefreshScheduler:
+    def __init__(self, store, budget, max_age=MAX_AGE_HOURS):
+        self.store = store
+        self.budget = budget
+        self.max_age = max_age
+
+    @classmethod
+    def from_args(cls, args, store):
+        if args.refresh_budget is None or store is None:
+            return None
+        return cls(store, args.refresh_budget, args.refresh_max_age)
+
+    def plan(self, uploads, now=None):
+        # Returns the IDs of the uploads to refresh and the last snapshots of all
+        # known uploads
+        now = now or datetime.now(pytz.UTC)
+        known = self.store.latest_snapshots(upload['video_id'] for upload in uploads)
+
+        new = []
+        overdue = []
+        candidates = []
+        for upload in uploads:
+            video_id = upload['video_id']
+            entry = known.get(video_id)
+            if entry is None or entry['duration'] is None or not entry['snapshots']:
+                new.append(video_id)
+                continue
+
+            snapshots = entry['snapshots']
+            age = hours_between(parse_timestamp(snapshots[0][0]), now)
+            if age > self.max_age:
+                overdue.append((age, video_id))
+            else:
+                candidates.append((velocity(upload, snapshots) * age, video_id))
+
+        overdue.sort(key=lambda candidate: -candidate[0])
+        candidates.sort(key=lambda candidate: -candidate[0])
+        ranked = dict.fromkeys(new + [video_id for _, video_id in overdue] + [video_id for _, video_id in candidates])
+        return set(list(ranked)[:self.budget * MAX_IDS_PER_REQUEST]), known
+
+    def iter_details(self, youtube, uploads, part='statistics', workers=1):
+        # Like youtube_api.iter_video_details, but only the planned uploads are
+        # requested; the others get details rebuilt from their last snapshot, or
+        # are left out when they have none.
+        # All uploads are planned together, so they are collected first.
+        uploads = list(uploads)
+        refresh, known = self.plan(uploads)
+        print(f"Refreshing statistics of {len(refresh)} of {len(uploads)} uploads")
+
+        details = get_video_details(youtube, [u['video_id'] for u in uploads if u['video_id'] in refresh], part, workers)
+        for upload in uploads:
+            video_id = upload['video_id']
+            if video_id in refresh:
+                if video_id in details:
+                    yield upload, details[video_id]
+                continue
+            if video_id not in known or not known[video_id]['snapshots']:
+                continue
+
+            _, view_count, like_count = known[video_id]['snapshots'][0]
+            yield upload, {
+                'id': video_id,
+                'statistics': {'viewCount': str(view_count), 'likeCount': str(like_count)},
+                'contentDetails': {'duration': known[video_id]['duration']},
+                'stale': True,
+            }
@@ -0,0 +1,47 @@
+# Drawing helpers shared by the report visualizations
+from functools import lru_cache
+
+from PIL import Image, ImageDraw
+
+from layout import BACKGROUND
+
+# Start and end colours of the bar gradients
+REDDIT_GRADIENT = ((255, 69, 0), (215, 49, 0))
+YOUTUBE_GRADIENT = ((255, 0, 0), (215, 0, 0))
+
+
+@lru_cache(maxsize=256)
+def gradient_strip(width, start, end):
+    # One pixel row fading from start to end, left to right
+    row = bytearray()
+    for x in range(width):
+        t = x / width
+        row.extend(int(s + t * (e - s)) for s, e in zip(start, end))
+    return Image.frombytes('RGB', (width, 1), bytes(row))
+
+
+@lru_cache(maxsize=256)
+def gradient_bar(width, height, start, end):
+    # Compute the gradient once as a strip and stretch it to the bar's height,
+    # rather than drawing the bar one pixel column at a time
+    return gradient_strip(width, start, end).resize((width, height), Image.NEAREST)
+
+
+def draw_gradient_bar(img, xy, width, height, gradient):
+    if width <= 0:
+        return
+    img.paste(gradient_bar(width, height, *gradient), xy)
+
+
+def draw_report(plan, gradient):
+    # Draw a layout.plan_report() plan onto a new image
+    img = Image.new('RGB', (plan['width'], plan['height']), BACKGROUND)
+    draw = ImageDraw.Draw(img)
+
+    for bar in plan['bars']:
+        draw_gradient_bar(img, bar['xy'], bar['width'], bar['height'], gradient)
+
+    for text in plan['texts']:
+        draw.text(text['xy'], text['text'], font=text['font'], fill=text['fill'])
+
+    return img
@@ -0,0 +1,13 @@
+# Response schemas for the Gemini requests. Kept apart from llm.py so pydantic
+# is only imported once a report actually asks for topics.
+from pydantic import BaseModel
+
+
+class topics(BaseModel):
+    topic1: str
+    topic2: str
+    topic3: str
+    topic4: str
+    topic5: str
+    topic6: str
+    topic7: str
@@ -0,0 +1,367 @@
+# Append-only history of the collected YouTube and Reddit statistics.
+# Every run appends one snapshot row per video instead of overwriting a CSV, so
+# questions like "how did video X's views grow" or "which channels drew the most
+# views over 90 days" can be answered from the indexes without rescanning old exports.
+#
+# Every run also updates per-day rollups: each video's and post's latest views,
+# likes and score of the day, and their totals per channel or subreddit. Weekly,
+# monthly and quarterly top-N, trend and comparison reports, for any past
+# window, are answered from those without any API calls.
+#
+#   python snapshots.py history VIDEO_ID    (use -- VIDEO_ID for IDs starting with '-')
+#   python snapshots.py top-channels --days 90
+#   python snapshots.py top --window quarter --kind videos --by gain
+#   python snapshots.py trend --window month --kind reddit --group personalfinance
+#   python snapshots.py compare --window week --kind shorts
+from datetime import date, datetime, timedelta
+import argparse
+import sqlite3
+import threading
+
+import pytz
+
+SNAPSHOT_PATH = 'snapshots.sqlite3'
+
+WINDOWS = {'week': 7, 'month': 30, 'quarter': 90}
+KINDS = ['videos', 'shorts', 'reddit']
+METRICS = ['views', 'likes', 'score']
+
+# Refresh the per-channel or per-subreddit totals of one day from its items
+REFRESH_GROUP = """
+    INSERT OR REPLACE INTO daily_groups
+    SELECT day, kind, grp, COUNT(*), SUM(views), SUM(likes), SUM(score)
+    FROM daily_items
+    WHERE day = ? AND kind = ? AND grp = ?
+    GROUP BY day, kind, grp
+"""
+
+
+def add_snapshot_arguments(parser):
+    parser.add_argument('--snapshots', default=SNAPSHOT_PATH,
+                        help=f"Snapshot history database (default: {SNAPSHOT_PATH})")
+    parser.add_argument('--no-snapshots', action='store_true',
+                        help="Don't record this run in the snapshot history (offline runs never do)")
+
+
+class SnapshotStore:
+    # `videos` holds what doesn't change between runs (one row per video);
+    # `snapshots` gets a row per video per run, partitioned by the UTC day the
+    # snapshot was taken so range queries only touch the days they need.
+    # `daily_items` keeps each video's or post's last numbers of every day and
+    # `daily_groups` their totals per channel or subreddit; the window queries
+    # read only these.
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                title TEXT NOT NULL,
+                url TEXT NOT NULL,
+                duration TEXT
+            );
+            CREATE TABLE IF NOT EXISTS snapshots (
+                video_id TEXT NOT NULL,
+                taken_at TEXT NOT NULL,
+                day TEXT NOT NULL,
+                view_count INTEGER NOT NULL,
+                like_count INTEGER NOT NULL,
+                PRIMARY KEY (video_id, taken_at)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS snapshots_day ON snapshots (day, video_id);
+            CREATE TABLE IF NOT EXISTS daily_items (
+                day TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                grp TEXT NOT NULL,
+                title TEXT NOT NULL,
+                views INTEGER NOT NULL,
+                likes INTEGER NOT NULL,
+                score INTEGER NOT NULL,
+                PRIMARY KEY (day, item_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS daily_items_kind ON daily_items (kind, day);
+            CREATE TABLE IF NOT EXISTS daily_groups (
+                day TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                grp TEXT NOT NULL,
+                items INTEGER NOT NULL,
+                views INTEGER NOT NULL,
+                likes INTEGER NOT NULL,
+                score INTEGER NOT NULL,
+                PRIMARY KEY (kind, grp, day)
+            ) WITHOUT ROWID;
+        """)
+        self.db.commit()
+
+        # Histories recorded before the rollups existed are rolled up once
+        if not self.db.execute("SELECT 1 FROM daily_items LIMIT 1").fetchone():
+            self.rebuild_rollups()
+
+    @classmethod
+    def from_args(cls, args):
+        # Offline and render-only runs replay cached responses, which aren't
+        # this run's statistics
+        if args.no_snapshots or args.offline or args.render_only:
+            return None
+        return cls(args.snapshots)
+
+    def record(self, videos, taken_at=None, chunk_size=500):
+        # Pass `videos` (Video and Post records, see records.py)
+        # through unchanged while appending them to the history, committing
+        # every chunk_size rows, so a stream of any length can be recorded
+        # without holding it in memory
+        taken_at = taken_at or datetime.now(pytz.UTC)
+        timestamp = taken_at.strftime('%Y-%m-%dT%H:%M:%SZ')
+        day = taken_at.strftime('%Y-%m-%d')
+
+        chunk = []
+        for video in videos:
+            chunk.append(video)
+            if len(chunk) >= chunk_size:
+                self.write(chunk, timestamp, day)
+                chunk = []
+            yield video
+
+        if chunk:
+            self.write(chunk, timestamp, day)
+
+    def write(self, items, timestamp, day):
+        # Posts have no views or likes to snapshot; they only go into the rollups.
+        # Neither do 'stale' videos, whose statistics weren't refreshed this run
+        # (see refresh.py) and would otherwise read as a run without any growth.
+        videos = [item for item in items if item.kind != 'reddit' and not item.stale]
+        rows = [
+            (day, item.video_id, item.kind, item.channel, item.title, item.view_count, item.like_count, 0)
+            if item.kind != 'reddit' else
+            (day, item.id, 'reddit', item.subreddit, item.title, 0, 0, item.score)
+            for item in items
+        ]
+
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?)",
+                [(video.video_id, video.kind, video.channel, video.title, video.url, video.duration)
+                 for video in videos]
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)",
+                [(video.video_id, timestamp, day, video.view_count, video.like_count) for video in videos]
+            )
+            self.db.executemany("INSERT OR REPLACE INTO daily_items VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.db.executemany(REFRESH_GROUP, sorted({(day, kind, grp) for day, _, kind, grp, *_ in rows}))
+            self.db.commit()
+
+    def rebuild_rollups(self):
+        # Recompute the rollups from the snapshot history: each video's last
+        # snapshot of each day
+        with self.lock:
+            self.db.executescript("""
+                DELETE FROM daily_items WHERE kind != 'reddit';
+                INSERT INTO daily_items
+                SELECT s.day, s.video_id, v.kind, v.channel, v.title, s.view_count, s.like_count, 0
+                FROM snapshots s
+                JOIN videos v USING (video_id)
+                WHERE s.taken_at = (
+                    SELECT MAX(taken_at) FROM snapshots
+                    WHERE video_id = s.video_id AND day = s.day
+                );
+                DELETE FROM daily_groups;
+                INSERT INTO daily_groups
+                SELECT day, kind, grp, COUNT(*), SUM(views), SUM(likes), SUM(score)
+                FROM daily_items
+                GROUP BY day, kind, grp;
+            """)
+            self.db.commit()
+
+    def view_history(self, video_id):
+        with self.lock:
+            return self.db.execute(
+                "SELECT taken_at, view_count, like_count FROM snapshots "
+                "WHERE video_id = ? ORDER BY taken_at",
+                (video_id,)
+            ).fetchall()
+
+    def latest_snapshots(self, video_ids, chunk_size=500):
+        # The last two snapshots of each of the given videos that are known,
+        # newest first, as
+        # {video_id: {'kind': ..., 'duration': ..., 'snapshots': [(taken_at, view_count, like_count), ...]}}
+        video_ids = list(video_ids)
+        latest = {}
+        with self.lock:
+            for start in range(0, len(video_ids), chunk_size):
+                chunk = video_ids[start:start + chunk_size]
+                rows = self.db.execute(f"""
+                    SELECT video_id, kind, duration, taken_at, view_count, like_count
+                    FROM (
+                        SELECT v.video_id, v.kind, v.duration, s.taken_at, s.view_count, s.like_count,
+                               ROW_NUMBER() OVER (PARTITION BY v.video_id ORDER BY s.taken_at DESC) AS n
+                        FROM videos v
+                        LEFT JOIN snapshots s USING (video_id)
+                        WHERE v.video_id IN ({', '.join('?' * len(chunk))})
+                    )
+                    WHERE n <= 2
+                    ORDER BY video_id, taken_at DESC
+                """, chunk).fetchall()
+                for video_id, kind, duration, taken_at, view_count, like_count in rows:
+                    entry = latest.setdefault(video_id, {'kind': kind, 'duration': duration, 'snapshots': []})
+                    if taken_at is not None:
+                        entry['snapshots'].append((taken_at, view_count, like_count))
+        return latest
+
+    def top_channels(self, days=90, kind=None, limit=10):
+        # Sum each channel's views, counting every video at its latest snapshot
+        # inside the window
+        since = (datetime.now(pytz.UTC) - timedelta(days=days)).strftime('%Y-%m-%d')
+        with self.lock:
+            return self.db.execute("""
+                WITH latest AS (
+                    SELECT video_id, MAX(taken_at) AS taken_at
+                    FROM snapshots
+                    WHERE day >= ?
+                    GROUP BY video_id
+                )
+                SELECT v.channel, SUM(s.view_count) AS views, COUNT(*) AS videos
+                FROM latest
+                JOIN snapshots s USING (video_id, taken_at)
+                JOIN videos v USING (video_id)
+                WHERE ? IS NULL OR v.kind = ?
+                GROUP BY v.channel
+                ORDER BY views DESC
+                LIMIT ?
+            """, (since, kind, kind, limit)).fetchall()
+
+    def top_items(self, window='month', kind='videos', metric='views', by='total', end=None, limit=10):
+        # The best items seen in the window ending on `end` (default today),
+        # ranked by their value on the last day they were seen in it, or by how
+        # much that changed since the first day. Titles and groups also come
+        # from the last day. Returns (title, group, value) rows.
+        first, last = window_days(window, end)
+        value = "value - first_value" if by == 'gain' else "value"
+        with self.lock:
+            return self.db.execute(f"""
+                SELECT title, grp, {value} AS ranked_value
+                FROM (
+                    SELECT item_id, title, grp, {metric} AS value,
+                           FIRST_VALUE({metric}) OVER (PARTITION BY item_id ORDER BY day) AS first_value,
+                           ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY day DESC) AS n
+                    FROM daily_items
+                    WHERE kind = ? AND day BETWEEN ? AND ?
+                )
+                WHERE n = 1
+                ORDER BY ranked_value DESC, item_id
+                LIMIT ?
+            """, (kind, first, last, limit)).fetchall()
+
+    def trend(self, window='month', kind='videos', metric='views', group=None, end=None):
+        # Daily totals over the window, of one channel or subreddit or of all of
+        # them. Returns (day, items, total) rows.
+        first, last = window_days(window, end)
+        with self.lock:
+            return self.db.execute(f"""
+                SELECT day, SUM(items), SUM({metric})
+                FROM daily_groups
+                WHERE kind = ? AND day BETWEEN ? AND ? AND (? IS NULL OR grp = ?)
+                GROUP BY day
+                ORDER BY day
+            """, (kind, first, last, group, group)).fetchall()
+
+    def compare(self, window='month', kind='videos', metric='views', end=None, limit=10):
+        # Each channel's or subreddit's total on the last recorded day of this
+        # window against the one before it. Returns (group, current, previous) rows.
+        first, last = window_days(window, end)
+        previous_first, previous_last = window_days(window, date.fromisoformat(first) - timedelta(days=1))
+        with self.lock:
+            return self.db.execute(f"""
+                WITH latest AS (
+                    SELECT grp, day, {metric} AS value,
+                           CASE WHEN day >= ? THEN 'current' ELSE 'previous' END AS period
+                    FROM daily_groups
+                    WHERE kind = ? AND day BETWEEN ? AND ?
+                ),
+                last_days AS (
+                    SELECT grp, period, MAX(day) AS day FROM latest GROUP BY grp, period
+                )
+                SELECT grp,
+                       SUM(CASE WHEN period = 'current' THEN value ELSE 0 END) AS current,
+                       SUM(CASE WHEN period = 'previous' THEN value ELSE 0 END) AS previous
+                FROM latest
+                JOIN last_days USING (grp, period, day)
+                GROUP BY grp
+                ORDER BY current DESC, grp
+                LIMIT ?
+            """, (first, kind, previous_first, last, limit)).fetchall()
+
+
+def window_days(window, end=None):
+    # First and last day (inclusive, ISO dates) of a window ending on `end`
+    end = end or datetime.now(pytz.UTC).date()
+    days = WINDOWS.get(window, window)
+    return (end - timedelta(days=days - 1)).isoformat(), end.isoformat()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the YouTube and Reddit snapshot history")
+    parser.add_argument('--snapshots', default=SNAPSHOT_PATH,
+                        help=f"Snapshot history database (default: {SNAPSHOT_PATH})")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    history = commands.add_parser('history', help="View count history of one video")
+    history.add_argument('video_id')
+
+    top = commands.add_parser('top-channels', help="Channels with the most views")
+    top.add_argument('--days', type=int, default=90)
+    top.add_argument('--kind', choices=['videos', 'shorts'])
+    top.add_argument('--limit', type=int, default=10)
+
+    def add_window_arguments(command):
+        command.add_argument('--window', choices=WINDOWS, default='month')
+        command.add_argument('--kind', choices=KINDS, default='videos')
+        command.add_argument('--metric', choices=METRICS,
+                             help="Defaults to score for reddit and views otherwise")
+        command.add_argument('--end', type=date.fromisoformat,
+                             help="Last day of the window, YYYY-MM-DD (default: today)")
+
+    items = commands.add_parser('top', help="Top videos or posts of a window")
+    add_window_arguments(items)
+    items.add_argument('--by', choices=['total', 'gain'], default='total',
+                       help="Rank by the latest value in the window or by how much it grew")
+    items.add_argument('--limit', type=int, default=10)
+
+    trend = commands.add_parser('trend', help="Daily totals over a window")
+    add_window_arguments(trend)
+    trend.add_argument('--group', help="Only this channel or subreddit")
+
+    compare = commands.add_parser('compare', help="Channels or subreddits against the previous window")
+    add_window_arguments(compare)
+    compare.add_argument('--limit', type=int, default=10)
+
+    args = parser.parse_args()
+    store = SnapshotStore(args.snapshots)
+    if args.command in ('top', 'trend', 'compare') and not args.metric:
+        args.metric = 'score' if args.kind == 'reddit' else 'views'
+
+    if args.command == 'history':
+        for taken_at, view_count, like_count in store.view_history(args.video_id):
+            print(f"{taken_at}  {view_count:>12,} views  {like_count:>10,} likes")
+    elif args.command == 'top-channels':
+        for channel, views, videos in store.top_channels(args.days, args.kind, args.limit):
+            print(f"{channel:<30} {views:>14,} views  ({videos} videos)")
+    elif args.command == 'top':
+        for i, (title, group, value) in enumerate(
+            store.top_items(args.window, args.kind, args.metric, args.by, args.end, args.limit), 1
+        ):
+            print(f"{i:>3}. {value:>14,} {args.metric}  {group:<25} {title}")
+    elif args.command == 'trend':
+        for day, items, total in store.trend(args.window, args.kind, args.metric, args.group, args.end):
+            print(f"{day}  {total:>14,} {args.metric}  ({items} items)")
+    else:
+        for group, current, previous in store.compare(args.window, args.kind, args.metric, args.end, args.limit):
+            change = f"{(current - previous) / previous:+.0%}" if previous else "new"
+            print(f"{group:<30} {current:>14,}  {previous:>14,}  {change:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# Concurrency helpers shared by the collection scripts
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    # Rate limiter shared by all worker threads. `rate` tokens are added per second
+    # up to `capacity`, and every API call takes `cost` tokens (its quota units).
+    # `budget` optionally caps the total number of units a run may spend: once it
+    # is used up, acquire() raises QuotaExceeded, which the collectors let
+    # through, so the run stops instead of burning through the daily API quota.
+    def __init__(self, rate, capacity=None, budget=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.budget = budget
+        self.tokens = self.capacity
+        self.spent = 0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reset(self):
+        # Start a new budget, e.g. for the next run of a long-running process
+        with self.lock:
+            self.spent = 0
+
+    def acquire(self, cost=1):
+        with self.lock:
+            if self.budget is not None and self.spent + cost > self.budget:
+                raise QuotaExceeded(f"Quota budget of {self.budget} units used up")
+            self.spent += cost
+
+            # Refill for the time that passed, then reserve our tokens. The balance
+            # may go negative; each caller sleeps off its own share of the debt.
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait:
+            time.sleep(wait)
+
+
+def map_concurrently(func, items, workers=1):
+    # Run func over items on a bounded thread pool. Results come back in the same
+    # order as items, so merging them stays deterministic.
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        return list(pool.map(func, items))
+
+
+def iter_concurrently(func, items, workers=1):
+    # Like map_concurrently, but yields each result, still in input order, as
+    # soon as it is ready instead of collecting them all first
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        yield from pool.map(func, items)
@@ -0,0 +1,40 @@
+# Streaming top-K selection for the collected posts and videos
+import heapq
+from itertools import count
+from operator import attrgetter
+
+
+class TopK:
+    # Keeps only the k best items seen so far for each metric, in a min-heap of
+    # size k, so memory and sort cost stay flat however many items stream
+    # through. Ties go to the item seen first, like a stable sort would.
+    # Items are records (see records.py) and metrics the names of their fields.
+    # `spill`, if given, is called with every item, e.g. to write the full export.
+    def __init__(self, k=10, metrics=('view_count',), spill=None):
+        self.k = k
+        self.metrics = metrics
+        self.spill = spill
+        self.heaps = {metric: [] for metric in metrics}
+        self.values = {metric: attrgetter(metric) for metric in metrics}
+        self.seen = count()
+
+    def add(self, item):
+        seq = next(self.seen)
+        for metric, heap in self.heaps.items():
+            entry = (self.values[metric](item), -seq, item)
+            if len(heap) < self.k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+
+        if self.spill:
+            self.spill(item)
+
+    def extend(self, items):
+        for item in items:
+            self.add(item)
+
+    def top(self, metric=None):
+        # Best first, for the first metric unless another is asked for
+        heap = self.heaps[metric or self.metrics[0]]
+        return [item for _, _, item in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
@@ -0,0 +1,275 @@
+# Shared helpers for the YouTube Data API scripts
+from datetime import datetime
+import json
+import os
+import queue
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urlparse
+
+import pytz
+
+from metrics import Metrics
+from throttle import QuotaExceeded, map_concurrently
+
+# videos().list accepts at most 50 comma-separated IDs per call
+MAX_IDS_PER_REQUEST = 50
+
+# Default Data API quota is 10,000 units per day; list calls cost 1 unit each
+DAILY_QUOTA = 10000
+
+# Every channel has auto-generated playlists of its uploads: UC<id> becomes
+# UU<id> for all uploads, UULF<id> for long-form videos only and UUSH<id> for Shorts
+PLAYLIST_PREFIXES = {
+    'uploads': 'UU',
+    'videos': 'UULF',
+    'shorts': 'UUSH',
+}
+
+# ISO-8601 durations as returned in contentDetails.duration, e.g. PT1H, PT4M13S or P1DT2H
+DURATION_PATTERN = re.compile(
+    r'^P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?'
+    r'(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$'
+)
+
+
+def add_api_arguments(parser):
+    parser.add_argument('--workers', type=int, default=8,
+                        help="Number of channels to fetch at the same time (default: 8)")
+    parser.add_argument('--quota', type=int, default=DAILY_QUOTA,
+                        help=f"Maximum quota units this run may spend (default: {DAILY_QUOTA})")
+    parser.add_argument('--requests-per-second', type=float, default=10,
+                        help="Maximum API requests per second across all workers (default: 10)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only crawl uploads newer than the last run and reuse the ones already seen")
+
+
+class YouTubeClient:
+    # Wraps the googleapiclient resource so every API call goes through execute(),
+    # which serves it from the response cache when possible and otherwise takes the
+    # call's quota units from the shared limiter. httplib2 isn't thread safe, so
+    # each request borrows an HTTP connection of its own from a pool and returns
+    # it afterwards, keeping it alive for the next worker thread or run. Every
+    # call and the quota units and latency of every request sent are counted in
+    # `metrics`.
+    def __init__(self, youtube, limiter=None, cache=None, metrics=None):
+        self.youtube = youtube
+        self.limiter = limiter
+        self.cache = cache
+        self.metrics = metrics or Metrics()
+        self.pool = queue.SimpleQueue()
+
+    def __getattr__(self, name):
+        # Build requests straight from the wrapped resource, e.g. youtube.videos().list(...)
+        return getattr(self.youtube, name)
+
+    def execute(self, request, cost=1):
+        return self.execute_entry(request, cost)[0]
+
+    def execute_entry(self, request, cost=1):
+        # Like execute(), but returns (response, cached), `cached` telling whether
+        # the response came from the response cache.
+        # Key on the endpoint name and query parameters, leaving out the API key
+        url = urlparse(request.uri)
+        endpoint = url.path.rsplit('/', 1)[-1]
+        self.metrics.call(endpoint)
+
+        if self.cache is None:
+            return self.send(request, endpoint, cost), False
+
+        params = {name: value for name, value in parse_qsl(url.query) if name != 'key'}
+        return self.cache.fetch_entry(endpoint, params, lambda: self.send(request, endpoint, cost))
+
+    def send(self, request, endpoint, cost=1):
+        if self.limiter:
+            self.limiter.acquire(cost)
+
+        try:
+            http = self.pool.get_nowait()
+        except queue.Empty:
+            from googleapiclient.http import build_http
+            http = build_http()
+
+        # Failed requests still use up quota
+        start = time.perf_counter()
+        try:
+            return request.execute(http=http)
+        finally:
+            self.metrics.request(endpoint, time.perf_counter() - start, cost)
+            self.pool.put(http)
+
+
+def playlist_id(channel_id, kind='uploads'):
+    # Convert a channel ID to the ID of one of its upload playlists
+    if not channel_id.startswith('UC'):
+        raise ValueError("Invalid channel ID format. Must start with 'UC'")
+    return PLAYLIST_PREFIXES[kind] + channel_id[2:]
+
+
+def parse_duration(duration):
+    # Length of an ISO-8601 duration in seconds
+    match = DURATION_PATTERN.match(duration)
+    if not match or duration in ('P', 'PT') or duration.endswith('T'):
+        raise ValueError(f"Invalid ISO-8601 duration: {duration}")
+
+    parts = {name: float(value) for name, value in match.groupdict(default='0').items()}
+    return int(
+        parts['weeks'] * 604800 + parts['days'] * 86400 + parts['hours'] * 3600
+        + parts['minutes'] * 60 + parts['seconds']
+    )
+
+
+def get_recent_playlist_items(youtube, playlist_id, since, after=None, max_items=None):
+    # Walk an upload playlist, newest first, and return (uploads, newest_seen):
+    # the items published since `since` (and after `after`, the high-water mark
+    # of an earlier run) plus the newest publishedAt seen. Upload playlists are
+    # ordered newest first, so the walk stops at the first item that is too old
+    # instead of paging through the channel's whole history.
+    uploads = []
+    newest_seen = None
+    request = youtube.playlistItems().list(
+        part='snippet',
+        playlistId=playlist_id,
+        maxResults=50
+    )
+
+    while request:
+        response = youtube.execute(request)
+
+        for item in response['items']:
+            published = item['snippet']['publishedAt']
+            published_at = parse_timestamp(published)
+            newest_seen = max(newest_seen or '', published)
+
+            if published_at < since or (after and published_at <= after):
+                return uploads, newest_seen
+
+            uploads.append({
+                'video_id': item['snippet']['resourceId']['videoId'],
+                'title': item['snippet']['title'],
+                'published_at': published
+            })
+            if max_items and len(uploads) >= max_items:
+                return uploads, newest_seen
+
+        request = youtube.playlistItems().list_next(request, response)
+
+    return uploads, newest_seen
+
+
+def get_video_details(youtube, video_ids, part='statistics', workers=1):
+    # Look up many videos at once, 50 IDs per videos().list call, instead of
+    # one request (and one quota unit) per video. Returns a dict keyed by video ID;
+    # videos that were deleted or made private are simply missing from it. Items
+    # served from the response cache are marked 'cached': their statistics are
+    # as old as the cache entry.
+    video_ids = list(dict.fromkeys(video_ids))  # drop duplicates, keep order
+    batches = [
+        video_ids[start:start + MAX_IDS_PER_REQUEST]
+        for start in range(0, len(video_ids), MAX_IDS_PER_REQUEST)
+    ]
+
+    def fetch_batch(batch):
+        try:
+            response, cached = youtube.execute_entry(youtube.videos().list(
+                part=part,
+                id=','.join(batch)
+            ))
+            if cached:
+                for item in response['items']:
+                    item['cached'] = True
+            return response['items']
+        except QuotaExceeded:
+            raise
+        except Exception as e:
+            print(f"An error occurred: {str(e)}")
+            print("Video IDs:", ', '.join(batch))
+            return []
+
+    details = {}
+    for items in map_concurrently(fetch_batch, batches, workers):
+        for item in items:
+            details[item['id']] = item
+
+    return details
+
+
+def iter_video_details(youtube, uploads, part='statistics', workers=1):
+    # Stream (upload, videos().list item) pairs for a stream of uploads. Uploads
+    # are buffered only until there are enough for `workers` full 50-ID requests,
+    # so IDs from different channels still share requests.
+    def resolve(batch):
+        details = get_video_details(youtube, [upload['video_id'] for upload in batch], part, workers)
+        for upload in batch:
+            if upload['video_id'] in details:
+                yield upload, details[upload['video_id']]
+
+    batch = []
+    for upload in uploads:
+        batch.append(upload)
+        if len(batch) >= MAX_IDS_PER_REQUEST * max(workers, 1):
+            yield from resolve(batch)
+            batch = []
+
+    if batch:
+        yield from resolve(batch)
+
+
+class UploadHistory:
+    # Remembers, per channel, the newest upload seen so far and the uploads that
+    # are still inside the reporting window. With it a run only has to crawl the
+    # playlist down to the last upload it already knows about.
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.channels = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.channels = json.load(f)
+
+    def high_water_mark(self, channel_id):
+        channel = self.channels.get(channel_id)
+        if not channel or not channel['newest_published_at']:
+            return None
+        return parse_timestamp(channel['newest_published_at'])
+
+    def merge(self, channel_id, new_uploads, since, newest_seen=None):
+        # Add this run's uploads to the known ones, forget those that fell out of
+        # the window, and return everything left, newest first. newest_seen is the
+        # newest publishedAt crawled this run, in or out of the window.
+        with self.lock:
+            channel = self.channels.get(channel_id, {'newest_published_at': None, 'uploads': {}})
+            known = channel['uploads']
+            for upload in new_uploads:
+                known[upload['video_id']] = upload
+
+            known = {
+                video_id: upload for video_id, upload in known.items()
+                if parse_timestamp(upload['published_at']) >= since
+            }
+            uploads = sorted(known.values(), key=lambda x: x['published_at'], reverse=True)
+
+            newest = [upload['published_at'] for upload in new_uploads]
+            if newest_seen:
+                newest.append(newest_seen)
+            if channel['newest_published_at']:
+                newest.append(channel['newest_published_at'])
+
+            self.channels[channel_id] = {
+                'newest_published_at': max(newest) if newest else None,
+                'uploads': known
+            }
+            return uploads
+
+    def save(self):
+        # Written next to the file and moved over it, so a crash mid-write
+        # can't leave a truncated history behind
+        with self.lock:
+            with open(f'{self.path}.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self.channels, f, indent=2)
+            os.replace(f'{self.path}.tmp', self.path)
+
+
+def parse_timestamp(value):
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=pytz.UTC)
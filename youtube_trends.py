@@ -0,0 +1,404 @@
+# Builds the long-form and Shorts reports in one run: each channel's long-form
+# and Shorts playlists are walked down to the reporting window, taking as many
+# playlistItems units as the two single-format scripts together, and the
+# statistics of both formats' uploads share the 50-ID videos().list requests.
+# youtube-longs.py and youtube-shorts.py run this with a single format,
+# crawling only that format's playlist.
+from datetime import datetime, timedelta
+from contextlib import ExitStack
+import pytz
+import csv
+import os
+import sys
+import argparse
+from dotenv import load_dotenv
+from throttle import QuotaExceeded, iter_concurrently
+from cache import CacheMiss, ResponseCache, add_cache_arguments
+from cards import CardCollector, CardRenderer, add_card_arguments, slug
+from clients import gemini_client, youtube_client
+from clustering import CLUSTERS, Corpus, add_cluster_arguments, cluster, prompt_items
+from llm import TopicService, add_llm_arguments
+from metrics import Metrics, add_metrics_arguments
+from prompts import PROMPT_TOKENS, add_prompt_arguments, build_prompt
+from records import Video
+from refresh import RefreshScheduler, add_refresh_arguments
+from images import ImageWriter, add_image_arguments
+from layout import plan_report
+from render import YOUTUBE_GRADIENT
+from snapshots import SnapshotStore, add_snapshot_arguments
+from topk import TopK
+from youtube_api import (
+    UploadHistory, add_api_arguments, get_recent_playlist_items, iter_video_details, parse_duration,
+    playlist_id
+)
+
+channels = [
+    {"name": "Daniel Iles", "id": "UCXl0djQ2IljcG-shgv-hIEA"},
+    {"name": "Erika2", "id": "UC-XDksokwZfLwnYNULNOeEg"},
+    {"name": "Humphrey Yang", "id": "UCiFpmeoDVc3O01LnrKW9VcQ"},
+    {"name": "Legacy Investing Show", "id": "UCJbOZAqwsdna6kjBZ0UcJmw"},
+    {"name": "Nick Talks Money", "id": "UC8i8OTwJW7vXjfcfd6PVPLQ"},
+    {"name": "Nischa", "id": "UCQpPo9BNwezg54N9hMFQp6Q"},
+    {"name": "Sean Loves Real Estate", "id": "UCxTnM9iMhQnTLUvGcwsgaEQ"},
+    {"name": "The Finance Engineer", "id": "UCjNmQ6frYwP0WDE7GJrn_WA"},
+    {"name": "Finance with Sharan", "id": "UCBI57iTXtmJoaI6Ht7MgcfA"},
+    {"name": "Ankur Warikoo", "id": "UCRzYN32xtBf3Yxsx5BvJWJw"},
+    {"name": "Mark Tilbury", "id": "UCxgAuX3XZROujMmGphN_scA"},
+    {"name": "Cara Chanaranade", "id": "UCD-qZSqFPqyx43L6gAR8qfQ"},
+    {"name": "Pranjal Kamra", "id": "UCNXapAc8mXTwW82MTncdfzQ"},
+    {"name": "Graham Stephan", "id": "UCa-ckhlKL98F8YXKQ-BALiw"},
+    {"name": "Andrei Jikh", "id": "UCGy7SkBjcIAgTiwkXEtPnYg"},
+    {"name": "Money Guy Show", "id": "UC9vUu4vlIlMC0dHQCTvQPbg"},
+    {"name": "Erin Talks Money", "id": "UCpXipTyhIY9kprpvVd-lu0A"},
+    {"name": "Parallel Wealth", "id": "UCwY3ZvNc_qCU-WuIKh-aulA"},
+    {"name": "Steph and Den", "id": "UC_vOw_uMG0TBad8PxOD-R2w"}
+]
+
+FORMATS = ['videos', 'shorts']
+
+# Each upload's format comes from the playlist it was found in, but long-form
+# uploads shorter than this are skipped as misfiled Shorts
+MIN_VIDEO_SECONDS = 60
+
+CSV_COLUMNS = {
+    'videos': ['channel', 'title', 'url', 'view_count', 'like_count', 'duration'],
+    'shorts': ['channel', 'title', 'url', 'view_count', 'like_count'],
+}
+
+def get_recent_uploads(youtube, channel_id, channel_name, kind='videos', max_results=10, history=None):
+    uploads_playlist_id = playlist_id(channel_id, kind)
+
+    # Calculate date one month ago
+    one_month_ago = datetime.now(pytz.UTC) - timedelta(days=30)
+
+    try:
+        # In incremental mode, stop at the newest upload seen on an earlier run
+        with youtube.metrics.scope('channels', channel_name):
+            uploads, newest_seen = get_recent_playlist_items(
+                youtube,
+                uploads_playlist_id,
+                since=one_month_ago,
+                after=history.high_water_mark(channel_id) if history else None,
+                max_items=max_results
+            )
+        for upload in uploads:
+            upload['channel'] = channel_name
+            upload['kind'] = kind
+
+        if history:
+            uploads = history.merge(channel_id, uploads, one_month_ago, newest_seen)[:max_results]
+
+        return uploads
+
+    # Running out of quota ends the run rather than every remaining channel
+    except QuotaExceeded:
+        raise
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        print("Channel ID:", channel_id)
+        return []
+
+def get_recent_videos_and_shorts(youtube, channels, formats=FORMATS, max_results=10, workers=1, history=None,
+                                 scheduler=None):
+    # Yield the recent uploads of every channel with their statistics, each tagged
+    # with its 'kind' (videos or shorts). Channels are crawled in parallel but
+    # their uploads stream on in channel order, and the statistics are fetched 50
+    # uploads per request across channels and formats instead of one request per
+    # upload. `history` holds an UploadHistory per format in incremental mode.
+    def channel_uploads(channel):
+        return [
+            upload for kind in formats
+            for upload in get_recent_uploads(youtube, channel['id'], channel['name'], kind, max_results,
+                                             history[kind] if history else None)
+        ]
+
+    def uploads():
+        for items in iter_concurrently(channel_uploads, channels, workers):
+            yield from items
+
+    # Get video details including duration; a refresh scheduler (see refresh.py)
+    # only requests the videos worth refreshing
+    if scheduler is not None:
+        details = scheduler.iter_details(youtube, uploads(), part='statistics,contentDetails', workers=workers)
+    else:
+        details = iter_video_details(youtube, uploads(), part='statistics,contentDetails', workers=workers)
+
+    for upload, video_details in details:
+        duration = video_details['contentDetails']['duration']
+
+        try:
+            seconds = parse_duration(duration)
+        except ValueError as e:
+            print(f"An error occurred: {str(e)}")
+            print("Video ID:", upload['video_id'])
+            continue
+
+        # The long-form playlist shouldn't contain shorts, but skip anything
+        # under a minute just in case
+        upload_kind = upload['kind']
+        if upload_kind == 'videos' and seconds < MIN_VIDEO_SECONDS:
+            continue
+
+        if upload_kind == 'shorts':
+            url = f"https://www.youtube.com/shorts/{upload['video_id']}"
+        else:
+            url = f"https://www.youtube.com/watch?v={upload['video_id']}"
+
+        # Statistics replayed from the response cache were already recorded
+        # when they were fetched, so they are 'stale' to the snapshot history
+        statistics = video_details['statistics']
+
+        yield Video(
+            kind=upload_kind,
+            video_id=upload['video_id'],
+            channel=upload['channel'],
+            title=upload['title'],
+            url=url,
+            view_count=int(statistics.get('viewCount', 0)),
+            like_count=int(statistics.get('likeCount', 0)),
+            duration=duration,
+            stale=video_details.get('stale', False) or video_details.get('cached', False)
+        )
+
+# Both return a future of the key topics. Given topic_clusters of every collected
+# upload (see clustering.py), the prompt summarizes those instead of the top 10.
+
+def summarize_videos(topic_service, top_10_videos, prompt_tokens=PROMPT_TOKENS, topic_clusters=None):
+    if topic_clusters:
+        return topic_service.submit(
+            build_prompt(
+                "The following are clusters of this month's personal finance related Youtube videos, each with its keywords, its share of all views and its most representative video titles. Please identify common themes and come up with 7 key topics that are discussed in these videos, giving more weight to the bigger clusters: \n\n",
+                prompt_items(topic_clusters, 'videos', 'views'),
+                prompt_tokens
+            )
+        )
+    return topic_service.submit(
+        build_prompt(
+            "The following are the 10 top personal finance related Youtube videos from the past month. Please identify common themes and come up with 7 key topics that are discussed in these videos: \n\n",
+            [(video.title, None) for video in top_10_videos],
+            prompt_tokens
+        )
+    )
+
+def summarize_shorts(topic_service, top_10_shorts, prompt_tokens=PROMPT_TOKENS, topic_clusters=None):
+    if topic_clusters:
+        return topic_service.submit(build_prompt("The following are clusters of this month's personal finance related Youtube shorts, each with its keywords, its share of all views and its most representative titles. Please, identify common themes and come up with 7 key topics that are discussed in these shorts, giving more weight to the bigger clusters: \n\n", prompt_items(topic_clusters, 'shorts', 'views'), prompt_tokens))
+    return topic_service.submit(build_prompt("The following are the 10 of the top posts personal finance related Youtube shorts from the past month. Please, identify common themes and come up with 7 key topics that are discussed in these posts: \n\n", [(short.title, None) for short in top_10_shorts], prompt_tokens))
+
+def get_date_range():
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=30)
+    return f"{start_date.strftime('%B %d')} - {end_date.strftime('%B %d, %Y')}"
+
+def video_entries(top):
+    return [
+        {
+            'value': video.view_count,
+            'label': f"{video.view_count:,} views",
+            'title': video.title,
+            'caption': f"posted by {video.channel}",
+        }
+        for video in top
+    ]
+
+def create_visualization(title, section_title, top_10, key_topics, date_range):
+    return plan_report(title, date_range, list(key_topics.dict().values()), section_title, video_entries(top_10))
+
+def create_videos_visualization(top_10_videos, key_topics, date_range):
+    return create_visualization(
+        "Trending YouTube Videos - Personal Finance",
+        "Most Viewed Videos This Month:",
+        top_10_videos, key_topics, date_range
+    )
+
+def create_shorts_visualization(top_10_shorts, key_topics, date_range):
+    return create_visualization(
+        "Trending YouTube Shorts - Personal Finance",
+        "Most Viewed Shorts This Month:",
+        top_10_shorts, key_topics, date_range
+    )
+
+REPORTS = {
+    'videos': (summarize_videos, create_videos_visualization, 'youtube_videos_trends'),
+    'shorts': (summarize_shorts, create_shorts_visualization, 'youtube_shorts_trends'),
+}
+
+def channel_cards(card_items, date_range):
+    # A card spec per channel and format (see cards.py)
+    return [
+        {
+            'stem': f"youtube_{kind}_{slug(channel)}",
+            'title': f"{channel} - YouTube {kind.title()}",
+            'date_range': date_range,
+            'topics': topics,
+            'section_title': f"Most Viewed {kind.title()} This Month:",
+            'entries': video_entries(top),
+            'gradient': YOUTUBE_GRADIENT,
+        }
+        for (kind, channel), top, topics in card_items.groups()
+    ]
+
+def csv_row(video):
+    return [getattr(video, column) for column in CSV_COLUMNS[video.kind]]
+
+def run(youtube, topic_service, formats=FORMATS, workers=1, incremental=False, store=None, channels=channels,
+        prompt_tokens=PROMPT_TOKENS, clusters=CLUSTERS, images=None, cards=None, scheduler=None):
+    formats = list(dict.fromkeys(formats))
+
+    # Collect uploads from all channels
+    # In incremental mode only uploads newer than the last run are crawled
+    history = {kind: UploadHistory(f"{kind}_history.json") for kind in formats} if incremental else None
+    videos = get_recent_videos_and_shorts(youtube, channels, formats, workers=workers, history=history,
+                                          scheduler=scheduler)
+
+    # Append this run's statistics to the snapshot history as they stream in
+    if store:
+        videos = store.record(videos)
+
+    metrics = youtube.metrics
+
+    corpora = {kind: Corpus() if clusters else None for kind in formats}
+    card_items = CardCollector('view_count') if cards is not None else None
+
+    def export(writer, video):
+        with metrics.stage('youtube', 'export'):
+            writer.writerow(csv_row(video))
+        if corpora[video.kind] is not None:
+            corpora[video.kind].add(video.title, weight=video.view_count)
+
+    # Only the top 10 of each format are kept in memory; every upload goes
+    # straight to its format's CSV file and its title to the format's corpus.
+    # The files replace the last run's exports only once the crawl is complete,
+    # so a run stopped e.g. by the quota budget leaves those in place.
+    date_range = get_date_range()
+    top = {}
+    with ExitStack() as files:
+        for kind in formats:
+            csvfile = files.enter_context(open(f'{kind}.csv.tmp', 'w', newline='', encoding='utf-8'))
+            writer = csv.writer(csvfile)
+            writer.writerows([[date_range], CSV_COLUMNS[kind]])
+            top[kind] = TopK(10, metrics=('view_count',), spill=lambda video, writer=writer: export(writer, video))
+
+        with metrics.stage('youtube', 'fetch'):
+            for video in videos:
+                top[video.kind].add(video)
+                if card_items is not None:
+                    card_items.add((video.kind, video.channel), video)
+
+    for kind in formats:
+        os.replace(f'{kind}.csv.tmp', f'{kind}.csv')
+
+    if history:
+        for kind_history in history.values():
+            kind_history.save()
+
+    create_reports(
+        {kind: (top[kind].top(), date_range, corpora[kind]) for kind in formats},
+        topic_service, metrics, prompt_tokens, clusters, images
+    )
+
+    if cards is not None:
+        with metrics.stage('youtube', 'cards'):
+            cards.render(channel_cards(card_items, date_range))
+
+def create_reports(reports, topic_service, metrics, prompt_tokens=PROMPT_TOKENS, clusters=CLUSTERS, images=None):
+    # reports maps each format to its top 10, date range and corpus (None when
+    # not clustering). The topics of all formats are requested at once, then
+    # each report is rendered in turn.
+    images = images or ImageWriter(metrics=metrics)
+    with metrics.stage('youtube', 'cluster'):
+        topic_clusters = {
+            kind: cluster(corpus, clusters) if corpus is not None else None
+            for kind, (_, _, corpus) in reports.items()
+        }
+
+    with metrics.stage('youtube', 'llm'):
+        requests = {
+            kind: REPORTS[kind][0](topic_service, top_10, prompt_tokens, topic_clusters[kind])
+            for kind, (top_10, _, _) in reports.items()
+        }
+        key_topics = {kind: request.result() for kind, request in requests.items()}
+
+    for kind, (top_10, date_range, _) in reports.items():
+        _, visualize, image_stem = REPORTS[kind]
+
+        # Create and save the visualization
+        with metrics.stage('youtube', 'render'):
+            images.save(visualize(top_10, key_topics[kind], date_range), YOUTUBE_GRADIENT, image_stem)
+
+def render_from_exports(topic_service, formats=FORMATS, metrics=None, prompt_tokens=PROMPT_TOKENS, clusters=CLUSTERS,
+                        images=None, cards=None):
+    # Rebuild the reports from the last run's CSV exports. The top 10 and the
+    # clusters come out the same as in that run, so their topics are found in
+    # the response cache.
+    metrics = metrics or Metrics()
+    card_items = CardCollector('view_count') if cards is not None else None
+    reports = {}
+    for kind in dict.fromkeys(formats):
+        corpus = Corpus() if clusters else None
+        top = TopK(10, metrics=('view_count',), spill=(
+            (lambda video, corpus=corpus: corpus.add(video.title, weight=video.view_count)) if corpus is not None else None
+        ))
+        with open(f'{kind}.csv', newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile)
+            date_range = next(reader)[0]
+            columns = next(reader)
+            for row in reader:
+                # The exports don't carry the video IDs
+                fields = dict(zip(columns, row))
+                video = Video(
+                    kind, None, fields['channel'], fields['title'], fields['url'],
+                    int(fields['view_count']), int(fields['like_count']), fields.get('duration')
+                )
+                top.add(video)
+                if card_items is not None:
+                    card_items.add((kind, video.channel), video)
+        reports[kind] = (top.top(), date_range, corpus)
+
+    create_reports(reports, topic_service, metrics, prompt_tokens, clusters, images)
+
+    if cards is not None:
+        with metrics.stage('youtube', 'cards'):
+            cards.render(channel_cards(card_items, date_range))
+
+def main(formats=FORMATS):
+    load_dotenv()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=formats,
+                        help="Reports to build (default: %(default)s)")
+    add_api_arguments(parser)
+    add_cache_arguments(parser)
+    add_snapshot_arguments(parser)
+    add_metrics_arguments(parser)
+    add_prompt_arguments(parser)
+    add_llm_arguments(parser)
+    add_cluster_arguments(parser)
+    add_image_arguments(parser)
+    add_card_arguments(parser)
+    add_refresh_arguments(parser)
+    args = parser.parse_args()
+
+    cache = ResponseCache.from_args(args)
+    metrics = Metrics()
+    topic_service = TopicService.from_args(args, gemini_client(), cache, metrics)
+    images = ImageWriter.from_args(args, metrics)
+    cards = CardRenderer.from_args(args, metrics)
+    try:
+        if args.render_only:
+            render_from_exports(topic_service, args.formats, metrics, args.prompt_tokens, args.clusters, images, cards)
+        else:
+            store = SnapshotStore.from_args(args)
+            run(youtube_client(args, cache, metrics), topic_service, args.formats, args.workers, args.incremental,
+                store, prompt_tokens=args.prompt_tokens, clusters=args.clusters, images=images, cards=cards,
+                scheduler=RefreshScheduler.from_args(args, store))
+    except (CacheMiss, QuotaExceeded) as e:
+        print(f"An error occurred: {str(e)}")
+        sys.exit(1)
+    finally:
+        if cards is not None:
+            cards.close()
+        metrics.write(args.metrics)
+
+if __name__ == '__main__':
+    main()